@@ -43,9 +43,10 @@ class Microdeploy(object):
         Microdeploy(config='deploy.yaml').device
         Microdeploy(config='deploy.yaml').device.ls()
         Microdeploy(debug=True, port='COM4', baud=115200)
+        Microdeploy(softreset=False)
     """
 
-    def __init__(self, config=None, debug=False, port=None, baud=None):
+    def __init__(self, config=None, debug=False, port=None, baud=None, softreset=None):
         self._debug = debug
         self._config_file = config
         self._config_override = {'device': {}}
@@ -53,6 +54,8 @@ class Microdeploy(object):
             self._config_override['device']['port'] = str(port)
         if baud:
             self._config_override['device']['baudrate'] = int(baud)
+        if softreset is not None:
+            self._config_override['device']['softreset'] = bool(softreset)
         self._setup()
 
     def _setup(self):
@@ -74,13 +77,30 @@ class Microdeploy(object):
         class device(object):
             """Access MCU filesystem and console."""
             console = self._to_fire()(self._device_object.console)
+            df = self._to_fire()(self._device_object.df)
             get = self._to_fire()(self._device_object.get)
             ls = self._to_fire()(self._device_object.ls)
             mkdir = self._to_fire()(self._device_object.mkdir)
             rm = self._to_fire()(self._device_object.rm)
             rmdir = self._to_fire()(self._device_object.rmdir)
-            run = self._to_fire()(self._device_object.run)
-            reset = self._to_fire()(self._device_object.reset)
+            @self._to_fire(doc_from=self._device_object.run)
+            def run(*args, **kwargs):
+                def progress(state):
+                    sys.stdout.write(state)
+                    sys.stdout.flush()
+                self._device_object.run(*args, _progress=progress, **kwargs)  # Note: output is streamed, not returned
+            @self._to_fire(doc_from=self._device_object.reset)
+            def reset(*args, **kwargs):
+                def progress(state):
+                    sys.stderr.write(state)
+                    sys.stderr.flush()
+                return self._device_object.reset(*args, _progress=progress, **kwargs)
+            @self._to_fire(doc_from=self._device_object.pull)
+            def pull(*args, **kwargs):
+                def progress(state):
+                    sys.stderr.write(state)
+                    sys.stderr.flush()
+                return self._device_object.pull(*args, _progress=progress, **kwargs)
             @self._to_fire(doc_from=self._device_object.put)
             def put(filename, *args, **kwargs):
                 def progress(state):
@@ -112,6 +132,37 @@ class Microdeploy(object):
                     sys.stderr.write(state)
                     sys.stderr.flush()
                 return self._package_object.push(*args, _progress=progress, **kwargs)
+            pack = self._to_fire()(self._package_object.pack)
+            @self._to_fire(doc_from=self._package_object.freeze)
+            def freeze(*args, **kwargs):
+                def progress(state):
+                    sys.stderr.write(state)
+                    sys.stderr.flush()
+                return self._package_object.freeze(*args, _progress=progress, **kwargs)
+            @self._to_fire(doc_from=self._package_object.image)
+            def image(*args, **kwargs):
+                def progress(state):
+                    sys.stderr.write(state)
+                    sys.stderr.flush()
+                return self._package_object.image(*args, _progress=progress, **kwargs)
+            @self._to_fire(doc_from=self._package_object.profile)
+            def profile(*args, **kwargs):
+                def progress(state):
+                    sys.stderr.write(state)
+                    sys.stderr.flush()
+                return self._package_object.profile(*args, _progress=progress, **kwargs)
+            @self._to_fire(doc_from=self._package_object.run)
+            def run(*args, **kwargs):
+                def progress(state):
+                    sys.stderr.write(state)
+                    sys.stderr.flush()
+                return self._package_object.run(*args, _progress=progress, **kwargs)
+            @self._to_fire(doc_from=self._package_object.watch)
+            def watch(*args, **kwargs):
+                def progress(state):
+                    sys.stderr.write(state)
+                    sys.stderr.flush()
+                return self._package_object.watch(*args, _progress=progress, **kwargs)
             @self._to_fire()
             def show(name):
                 """Show package definition (as of yaml config, with compiled `ignore` if applicable)."""
@@ -121,12 +172,17 @@ class Microdeploy(object):
             """Hashcache information."""
             def __init__(self_cache):
                 self_cache.hashcache = self._device_object.hashcache
+                self_cache.manifest = self._device_object.manifest
                 # self_cache.hashcache = device_module._HashCache(self._device_object)
             @self._to_fire(decorate_with=None)
             def show(self):
                 """Show contents of hashcache."""
                 return self.hashcache._read(failsafe=False)
             @self._to_fire(decorate_with=None)
+            def manifest(self):
+                """Show contents of manifest stored on MCU."""
+                return self.manifest.read()
+            @self._to_fire(decorate_with=None)
             def refresh(self):
                 """Refresh hashcache from files contents on MCU."""
                 return self.hashcache.refresh()
@@ -152,6 +208,60 @@ class Microdeploy(object):
             ports[port.device] = port.description
         return ports
 
+    def inventory(self, refresh=False, timeout=15):
+        """
+        Probe devices on all serial ports concurrently (unique id, implementation, firmware, raw-paste support, free flash),
+        caching results by USB serial number: cached devices are not probed again, unless `refresh`.
+        A port not answering within `timeout` seconds is reported as unavailable.
+        Devices can then be addressed by unique id, or alias (see config `devices`), instead of port.
+        """
+        return self._handle_exception(self._inventory)(refresh, timeout)
+
+    def _inventory(self, refresh, timeout):
+        import serial.tools.list_ports
+        import threading
+        import time
+        hashcache = self._device_object.hashcache
+        cached = {row['serial_number']: row for row in hashcache.inventory()}
+        aliases = {str(unique_id): alias for alias, unique_id in self._config_object.config['devices'].items()}
+        results = {}
+        def probe(port):
+            config = config_module.Config(self._config_file, override={'device': {'port': port.device, 'softreset': False}})
+            device = device_module.Device(config)
+            try:
+                results[port.device] = device.probe()
+            except (Exception, BaseException) as e:  # Note: PyboardError does not extend Exception
+                results[port.device] = {'error': str(e)}
+            finally:
+                if device._pyboard:
+                    device._pyboard.close()
+        ports = []
+        for port in serial.tools.list_ports.comports():
+            key = port.serial_number or port.device
+            if refresh or key not in cached:
+                ports.append(port)
+            elif cached[key]['port'] != port.device:  # Note: port changed, capabilities are reused
+                hashcache.inventory_add(key, port.device, cached[key]['info'])
+        threads = [threading.Thread(target=probe, args=(port,), name=f'probe {port.device}', daemon=True) for port in ports]  # Note: daemon, a hung port never blocks exit
+        for thread in threads:
+            thread.start()
+        time_end = time.time() + timeout
+        for thread in threads:
+            thread.join(max(time_end - time.time(), 0))
+        for port in ports:
+            info = results.get(port.device, {'error': f'timeout after {timeout}s, port unavailable'})
+            if 'error' in info:
+                sys.stderr.write(f'Probe failed: {port.device}: {info["error"]}\n')
+                continue
+            hashcache.inventory_add(port.serial_number or port.device, port.device, info)
+        return {
+            row['port']: dict(row['info'], serial_number=row['serial_number'], alias=aliases.get(row['unique_id']))
+            for row in hashcache.inventory()}
+
+    def history(self, limit=20, all=False):
+        """Show last pushes to device (or to all devices) and measured throughput."""
+        return self._device_object.hashcache.history(limit, all_devices=all)
+
     # @property
     # def self(self):
     #     return {
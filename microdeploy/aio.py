@@ -0,0 +1,105 @@
+"""
+Microdeploy asyncio API.
+
+Same as `Device` and `Package`, with coroutines, for driving many devices from one event loop:
+
+    import asyncio
+    from microdeploy.config import Config
+    from microdeploy.aio import AsyncDevice, AsyncPackage
+
+    async def deploy(port):
+        device = AsyncDevice(Config('microdeploy.yaml', override={'device': {'port': port}}))
+        await AsyncPackage(device).push('tests')
+        await device.close()
+
+    async def main():
+        await asyncio.gather(*[deploy(port) for port in ['/dev/ttyUSB0', '/dev/ttyUSB1']])
+
+    asyncio.run(main())
+
+Operations of a device run one at a time in a worker thread owning its serial port.
+Errors are raised as exceptions (`PyboardError` as `DeviceError`), and a cancelled operation interrupts the MCU.
+Note: `_progress` callbacks are called from the worker thread.
+"""
+
+from . import device as device_module
+from . import package as package_module
+import concurrent.futures
+import contextlib
+import functools
+import asyncio
+
+
+class DeviceError(RuntimeError):
+    """Error reported by MCU (ie. `ampy.pyboard.PyboardError`, which does not extend `Exception`)."""
+
+
+class AsyncDevice(object):
+    """Coroutine version of `Device`, having the same methods (except interactive `console`)."""
+
+    def __init__(self, config):
+        self.config = config
+        self.device = device_module.Device(config)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='microdeploy')
+
+    async def close(self):
+        """Close serial port and worker thread."""
+        if self.device._pyboard:
+            await self._call(self.device._pyboard.close)
+        self.executor.shutdown(wait=False)
+
+    async def _call(self, method, *args, **kwargs):
+        """Run `method` in worker thread, and on cancellation interrupt it and wait until serial port is released."""
+        pyboard = self.device._pyboard
+        if pyboard:
+            pyboard.cancelled = False
+        future = asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(_call, method, *args, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if self.device._pyboard:
+                self.device._pyboard.cancelled = True
+            with contextlib.suppress(Exception):
+                await future
+            raise
+
+    def __repr__(self):
+        return f'<AsyncDevice {self.config.device()["port"]}>'
+
+
+class AsyncPackage(object):
+    """Coroutine version of `Package`, having the same methods, using device of `AsyncDevice`."""
+
+    def __init__(self, device: AsyncDevice):
+        self.async_device = device
+        self.package = package_module.Package(device.config)
+        self.package.device = device.device  # Note: share serial port and worker thread with device
+
+    async def _call(self, method, *args, **kwargs):
+        return await self.async_device._call(method, *args, **kwargs)
+
+
+# Helpers
+
+def _call(method, *args, **kwargs):
+    """Call `method`, raising `PyboardError` as `DeviceError`."""
+    try:
+        return method(*args, **kwargs)
+    except device_module.ampy_pyboard.PyboardError as e:
+        raise DeviceError(*e.args) from None
+
+
+def _to_async(name, component):
+    """Return coroutine method calling method `name` of attribute `component` in worker thread."""
+    async def wrapper(self, *args, **kwargs):
+        return await self._call(getattr(getattr(self, component), name), *args, **kwargs)
+    wrapper.__name__ = name
+    wrapper.__doc__ = getattr(device_module.Device if component == 'device' else package_module.Package, name).__doc__
+    return wrapper
+
+
+for name in ('ls', 'get', 'pull', 'put', 'rename', 'copy', 'df', 'space', 'exec', 'rm', 'mkdir', 'rmdir', 'run', 'reset'):
+    setattr(AsyncDevice, name, _to_async(name, 'device'))
+for name in ('names', 'files', 'push', 'pack', 'freeze', 'image', 'run', 'profile'):  # Note: `watch` never returns
+    setattr(AsyncPackage, name, _to_async(name, 'package'))
+del name
@@ -24,8 +24,9 @@ class MicrodeployCLI(Microdeploy):
 
     Arguments:
         --config  - use specific config file (default: {{default_config_file}})
-        --port    - device port, overriding config
+        --port    - device port (or WebREPL url, eg. ws://192.168.4.1:8266), overriding config
         --baud    - device baudrate, overriding config
+        --nosoftreset - enter raw REPL without soft reset (boot.py is not run), overriding config
         --debug   - print exception traceback, if any
 
     Usage:
@@ -33,17 +34,25 @@ class MicrodeployCLI(Microdeploy):
         python -m microdeploy --help
         python -m microdeploy --config config-custom.yaml
         python -m microdeploy --port /dev/ttyUSB0 --baud 115200
+        python -m microdeploy --port ws://192.168.4.1:8266
+        python -m microdeploy --nosoftreset package push tests
 
         python -m microdeploy config
         python -m microdeploy config show
         python -m microdeploy device
         python -m microdeploy device show
         python -m microdeploy device console
+        python -m microdeploy device console /dev/ttyUSB0 sensor=/dev/ttyUSB1 --log logs
         python -m microdeploy device ls
+        python -m microdeploy device df
         python -m microdeploy device mkdir testdir
         python -m microdeploy device rmdir testdir
         python -m microdeploy device put main.py
         python -m microdeploy device put test.py main.py
+        python -m microdeploy device pull backup
+        python -m microdeploy device pull /data backup/data --compress
+        python -m microdeploy device run script.py --timeout 10
+        python -m microdeploy device run script.py --cache
         python -m microdeploy device rm main.py
         python -m microdeploy device rmdir .  # Note: Remove all files on MCU filesystem.
         python -m microdeploy package
@@ -52,20 +61,37 @@ class MicrodeployCLI(Microdeploy):
         python -m microdeploy package files tests
         python -m microdeploy package put tests
         python -m microdeploy package put tests --debug --nofail --noput --norun --force
-        python -m microdeploy package run tests-run.py
+        python -m microdeploy package put tests --resume
+        python -m microdeploy package put tests --staged
+        python -m microdeploy package pack tests
+        python -m microdeploy package pack tests --mpy
+        python -m microdeploy package run tests-run
+        python -m microdeploy package run tests-run --mpy --compare
+        python -m microdeploy package freeze tests
+        python -m microdeploy package image tests --size 0x200000
+        python -m microdeploy package image tests --format fat --size 0x100000 --output tests.img
+        python -m microdeploy package profile tests
+        python -m microdeploy package profile tests --output profile.json
+        python -m microdeploy package watch tests
+        python -m microdeploy package watch tests-run --run --reset
         python -m microdeploy package cache
         python -m microdeploy package cache show
+        python -m microdeploy package cache manifest
         python -m microdeploy package cache refresh
         python -m microdeploy package cache clear
+        python -m microdeploy inventory
+        python -m microdeploy inventory --refresh
+        python -m microdeploy --port bench device ls
+        python -m microdeploy history
+        python -m microdeploy history --all --limit 100
     """
-    #   python -m microdeploy package pack example_ui  # TODO: make and upload a single python file including all imports starting from main.py
     #   python -m microdeploy flash erase
     #   python -m microdeploy flash write micropython.bin
 
     __doc__ = __doc__.replace('{{default_config}}', DEFAULT_CONFIG_FILE) 
 
-    def __init__(self, config:str=DEFAULT_CONFIG_FILE, debug:bool=False, port:str=None, baud:int=None):
-        super().__init__(config=config, debug=debug, port=port, baud=baud)
+    def __init__(self, config:str=DEFAULT_CONFIG_FILE, debug:bool=False, port:str=None, baud:int=None, softreset:bool=None):
+        super().__init__(config=config, debug=debug, port=port, baud=baud, softreset=softreset)
 
     def _setup(self):
         try:
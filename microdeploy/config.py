@@ -2,6 +2,7 @@
 Microdeploy Configuration manager.
 """
 
+from . import source as source_module
 import yaml
 import glob
 import re
@@ -30,6 +31,7 @@ class Config(object):
         self.config = {
             'packages': config_yaml.get('packages', {}),
             'device': config_yaml.get('device', {}),
+            'devices': config_yaml.get('devices', {}),  # aliases of devices unique id - see `microdeploy inventory`
             'default': {
                 # 'destination': config_yaml.get('default', {}).get('destination') or '/' or None,  # default path of destination for put files to MCU
                 'baudrate': config_yaml.get('default', {}).get('baudrate') or default_baudrate}}
@@ -43,7 +45,10 @@ class Config(object):
         device = dict(device)
         return {
             'port': device.get('port'),
-            'baudrate': device.get('baudrate', self.config['default']['baudrate'])}
+            'baudrate': device.get('baudrate', self.config['default']['baudrate']),
+            'softreset': device.get('softreset', not str(device.get('port')).startswith(('ws://', 'wss://'))),  # Note: soft reset closes WebREPL connection
+            'password': device.get('password', 'python'),  # WebREPL password, for port like `ws://192.168.4.1:8266`
+            'ready': device.get('ready', '>>> ')}  # marker received from MCU when ready after reset (default: REPL prompt)
 
     def package(self, name: str) -> dict:
         """Return package configuration dict."""
@@ -64,8 +69,8 @@ class Config(object):
 
         return package
 
-    def package_files(self, name: str) -> list:
-        """Return list of files in package having `name` (processing includes)."""
+    def package_files(self, name: str, cachedir: str = None) -> list:
+        """Return list of files in package having `name` (processing includes), caching imports parsed for `shake` in `cachedir`."""
         try:
             package_config = self.package(name)
         except KeyError as e:
@@ -99,12 +104,24 @@ class Config(object):
 
         for package_to_include in package_config.get('include', []):
             try:
-                package_files = self.package_files(package_to_include) + package_files
+                package_files = self.package_files(package_to_include, cachedir) + package_files
             except ValueError as e:
                 raise KeyError(f'Package not found: {package_to_include} - in {name}.include')
 
+        if package_config.get('shake', False):
+            package_files = self.package_files_shaken(name, package_files, cachedir)
+
         return package_files
 
+    def package_files_shaken(self, name: str, package_files: list, cachedir: str = None) -> list:
+        """Return `package_files` without python modules not imported from entry points of package `name` (main.py, boot.py, `run` scripts and `entry`)."""
+        package_config = self.package(name)
+        entries = [source for source, destination in package_files if destination.strip('/') in ('main.py', 'boot.py')]
+        entries += [self.make_relative_to_configfile(filename) for filename in package_config.get('run', []) + package_config.get('entry', [])]
+        if not entries:
+            raise ValueError(f'Package has no entry point for `shake`: {name} - add main.py, boot.py, `run` or `entry` files')
+        return source_module.shake(package_files, entries, cachedir=cachedir)
+
     def make_relative_to_configfile(self, filename):
         """Return `filename` made relative to config file path."""
         return os.path.join(os.path.relpath(os.path.dirname(self.config_filename) or '.'), filename)
@@ -0,0 +1,128 @@
+"""
+Microdeploy Console monitor.
+
+Read serial output of several MCU concurrently, as timestamped lines prefixed with device name,
+to stdout and rotating log files, keeping last lines in memory.
+"""
+
+import collections
+import selectors
+import datetime
+import serial
+import time
+import sys
+import os
+
+
+class Monitor(object):
+    """
+    Multiplexed serial console for `ports` (`dict` of device name -> port), read only.
+    With `logdir`, lines are written to `logdir/NAME.log`, rotated at `log_bytes` (keeping `log_count` files).
+    The last `buffer_lines` lines of all devices are kept in `buffer` (as tuples of timestamp, name, line).
+    """
+
+    def __init__(self, ports: dict, baudrate: int = 115200, logdir: str = None, log_bytes: int = 10 * 2**20, log_count: int = 5,
+                 buffer_lines: int = 10000, output=None):
+        self.ports = ports
+        self.baudrate = baudrate
+        self.logdir = logdir
+        self.log_bytes = log_bytes
+        self.log_count = log_count
+        self.buffer = collections.deque(maxlen=buffer_lines)
+        self.output = output if output is not None else sys.stdout.buffer
+        self.bytes_read = collections.Counter()
+
+    def run(self, duration: float = None):
+        """Read ports until ctrl-C (or during `duration` seconds), and return bytes read per device."""
+        selector = selectors.DefaultSelector()
+        connections = {}
+        logs = {}
+        partial = {}
+        try:
+            for name, port in self.ports.items():
+                connection = serial.Serial(port, self.baudrate, timeout=0)  # Note: non-blocking reads
+                connections[name] = connection
+                partial[name] = b''
+                if self.logdir:
+                    logs[name] = _RotatingLog(os.path.join(self.logdir, f'{name}.log'), self.log_bytes, self.log_count)
+            try:
+                for name, connection in connections.items():
+                    selector.register(connection, selectors.EVENT_READ, name)
+                ready = lambda: [(key.data, key.fileobj) for key, events in selector.select(timeout=0.5)]
+            except (ValueError, OSError):  # Note: ports can't be selected on Windows, they are polled
+                ready = lambda: _poll(connections)
+            time_end = duration and time.time() + duration
+            while not time_end or time.time() < time_end:
+                for name, connection in ready():
+                    data = connection.read(connection.in_waiting or 1)  # Note: read all that is buffered, to keep up with high baudrates
+                    self.bytes_read[name] += len(data)
+                    *lines, partial[name] = (partial[name] + data).split(b'\n')
+                    if len(partial[name]) > 4096:  # Note: flush long lines, memory is bounded
+                        lines.append(partial[name])
+                        partial[name] = b''
+                    if lines:
+                        self._write(name, lines, logs.get(name))
+                self.output.flush()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for name, line in partial.items():
+                if line:
+                    self._write(name, [line], logs.get(name))
+            for connection in connections.values():
+                connection.close()
+            selector.close()
+            for log in logs.values():
+                log.close()
+            self.output.flush()
+        return dict(self.bytes_read)
+
+    def _write(self, name, lines, log=None):
+        timestamp = datetime.datetime.now().isoformat(sep=' ', timespec='milliseconds').encode()
+        prefix = b'%s [%s] ' % (timestamp, name.encode())
+        text = b''.join(prefix + line.rstrip(b'\r') + b'\n' for line in lines)
+        self.output.write(text)
+        if log:
+            log.write(text)
+        self.buffer.extend((timestamp.decode(), name, line.rstrip(b'\r').decode('utf-8', errors='replace')) for line in lines)
+
+
+# Helpers
+
+def _poll(connections, interval=0.01):
+    """Return `(name, connection)` of `connections` having bytes waiting, after `interval` seconds if none."""
+    ready = [(name, connection) for name, connection in connections.items() if connection.in_waiting]
+    if not ready:
+        time.sleep(interval)
+    return ready
+
+
+class _RotatingLog(object):
+    """Buffered log file, rotated as `FILENAME.1` ... `FILENAME.COUNT` when larger than `max_bytes`."""
+
+    def __init__(self, filename, max_bytes, count, buffering=2**16):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.count = count
+        self.buffering = buffering
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.file = open(filename, 'ab', buffering=buffering)
+        self.size = self.file.tell()
+
+    def write(self, data):
+        if self.size + len(data) > self.max_bytes and self.size:
+            self.rotate()
+        self.file.write(data)
+        self.size += len(data)
+
+    def rotate(self):
+        self.file.close()
+        for number in range(self.count - 1, 0, -1):
+            if os.path.exists(f'{self.filename}.{number}'):
+                os.replace(f'{self.filename}.{number}', f'{self.filename}.{number + 1}')
+        os.replace(self.filename, f'{self.filename}.1')
+        self.file = open(self.filename, 'ab', buffering=self.buffering)
+        self.size = 0
+
+    def close(self):
+        self.file.close()
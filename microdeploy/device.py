@@ -6,10 +6,19 @@ Microdeploy Device (mcu) manager.
 #   https://github.com/scientifichackers/ampy/blob/master/ampy/files.py
 
 from .config import Configurable
+from . import console as console_module
+from . import webrepl as webrepl_module
 from ampy import pyboard as ampy_pyboard
 from ampy import files as ampy_files
 import terminal_s.terminal
+import collections
+import errno
+import re
+import contextlib
+import base64
+import zlib
 import time
+import ast
 import sys
 import os
 
@@ -25,7 +34,10 @@ class Device(Configurable):
     def pyboard(self):
         """Return singleton instance of `ampy.pyboard.Pyboard`."""
         if not self._pyboard:
-            self._pyboard = ampy_pyboard.Pyboard(self.config.device()['port'], baudrate=self.config.device()['baudrate'], user='micro', password='python', wait=0, rawdelay=0)
+            if self.port_error:
+                raise self.port_error
+            device_config = self.config.device()
+            self._pyboard = _Pyboard(self.port, baudrate=device_config['baudrate'], user='micro', password=device_config['password'], wait=0, rawdelay=0, softreset=device_config['softreset'])
         return self._pyboard
 
     @property
@@ -40,13 +52,92 @@ class Device(Configurable):
         self._pyboard = None
         self._ampy = None
         self.hashcache = _HashCache(self)
+        self.manifest = _Manifest(self)
+        self.port = self.port_error = None  # Note: hashcache may identify device before port is resolved, eg. migrating legacy cache
+        try:
+            self.port, self.port_error = self.resolve(self.config.device()['port']), None  # Note: resolved once, identifies device in hashcache
+        except ValueError as e:
+            self.port, self.port_error = None, e  # Note: raised when connecting, eg. `microdeploy inventory` works without device
+
+    def resolve(self, address):
+        """
+        Return port of device `address`: a port, or a unique id or alias (see config `devices`) of a device
+        found by `microdeploy inventory`, connected to a port having the cached USB serial number.
+        """
+        if address is None or '/' in str(address) or re.match(r'COM\d+$', str(address)):
+            return address
+        unique_id = str(self.config.config.get('devices', {}).get(address, address))
+        serial_numbers = [row['serial_number'] for row in self.hashcache.inventory() if row['unique_id'] == unique_id]
+        import serial.tools.list_ports
+        for port in serial.tools.list_ports.comports():
+            if port.serial_number and port.serial_number in serial_numbers:
+                return port.device
+        raise ValueError(f'Device not found: {address} (unique id: {unique_id}) - connect device and run `microdeploy inventory --refresh`')
+
+    def probe(self, timeout=1):
+        """
+        Return MCU information: unique id, implementation, firmware version, raw-paste support and free flash,
+        waiting at most `timeout` seconds for each read on port (eg. a port without MCU never answers).
+        """
+        self.pyboard.serial.timeout = timeout
+        raw_paste = self.pyboard.raw_paste_supported()
+        info, statvfs = ast.literal_eval(self.exec(_PROBE).strip())
+        return dict(info, raw_paste=raw_paste, free=self._statvfs(statvfs)['free'])
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Hold raw REPL across operations: the running program is interrupted once,
+        instead of entering (and soft resetting, if configured) for every operation.
+
+            with device.session():
+                device.put('main.py')
+                device.run('tests-run.py')
+        """
+        pyboard = self.pyboard
+        pyboard.session_depth += 1
+        try:
+            pyboard.enter_raw_repl()
+            yield self
+            if pyboard.session_depth == 1:
+                self.manifest.save()  # Note: in the same session as uploads
+        except BaseException:
+            if pyboard.session_depth == 1 and self.manifest.modified:
+                with contextlib.suppress(Exception, ampy_pyboard.PyboardError):  # Note: manifest file was removed before files were modified, it is safe not to save
+                    pyboard._enter_raw_repl_without_softreset()  # Note: interrupted command may have left raw REPL out of sync
+                    self.manifest.save()
+            raise
+        finally:
+            pyboard.session_depth -= 1
+            if not pyboard.session_depth:
+                self.manifest.unload()
+            pyboard.exit_raw_repl()
 
-    def console(self, **overrides):
-        """Open serial console to MCU."""
-        device_config = self.config.device(**overrides)
-        terminal_s.terminal.run(
-            port=device_config['port'],
-            baudrate=device_config['baudrate'])
+    def same(self, filename, content_to_compare):
+        """Return `True` if file on MCU matches `content_to_compare` (using manifest on MCU in session, else hashcache)."""
+        same = self.manifest.same(filename, content_to_compare)
+        if same is None:
+            same = self.hashcache.same(filename, content_to_compare)
+            if same:
+                self.manifest.add(filename, content_to_compare)  # Note: in session, recorded in manifest written again
+        return same
+
+    def console(self, *ports, log=None, log_bytes=10 * 2**20, log_count=5):
+        """
+        Open interactive serial console to MCU, or with `ports` (eg. `/dev/ttyUSB0` or `name=/dev/ttyUSB0`),
+        show output of several MCU as timestamped lines prefixed with device name (writing rotating logs in directory `log`).
+        """
+        device_config = self.config.device()
+        if not ports:
+            if self.port_error:
+                raise self.port_error
+            terminal_s.terminal.run(
+                port=self.port,
+                baudrate=device_config['baudrate'])
+            return
+        ports = dict(port.split('=', 1) if '=' in port else (os.path.basename(port), port) for port in ports)
+        ports = {name: self.resolve(port) for name, port in ports.items()}  # Note: ports can be given as unique id or alias
+        console_module.Monitor(ports, baudrate=device_config['baudrate'], logdir=log, log_bytes=log_bytes, log_count=log_count).run()
 
     def ls(self, directory='/', recursive=True, long=False):
         """Return files on MCU filesystem."""
@@ -54,37 +145,210 @@ class Device(Configurable):
 
     def get(self, filename):
         """Return file content from MCU filesystem."""
-        return self.ampy.get(filename)
+        if self.pyboard.webrepl:
+            return self._get_webrepl(filename)
+        with self.session():  # Note: entering raw REPL (and soft resetting, if configured) once
+            content = self.ampy.get(filename)
+            self.exec("globals().pop('len', None)")  # Note: script of ampy shadows builtin `len`, kept in globals without soft reset
+        return content
+
+    def pull(self, directory, destination=None, compress=False, _progress=lambda state: None):
+        """
+        Download files in `directory` on MCU into local `destination` (default: `directory` into current directory),
+        preserving tree and skipping files having same content locally, in one round trip (with `compress`, using `deflate` on MCU),
+        and return bytes downloaded.
+        """
+        if destination is None:
+            directory, destination = '/', directory
+        directory = '/' + directory.strip('/')
+        hashes = {}
+        for local_directory, directories, filenames in os.walk(destination):
+            for filename in filenames:
+                local_filename = os.path.join(local_directory, filename)
+                hash = hashlib.sha256()
+                with open(local_filename, 'rb') as f:
+                    for chunk in iter(lambda: f.read(2**16), b''):
+                        hash.update(chunk)
+                hashes[os.path.relpath(local_filename, destination).replace(os.sep, '/')] = hash.hexdigest()
+        pull = _Pull(destination, compress, _progress)
+        self.pyboard.enter_raw_repl()
+        self.pyboard.exec_raw_no_follow(_PULL.replace('{{directory}}', repr(directory)).replace('{{hashes}}', repr(hashes)).replace('{{compress}}', repr(bool(compress))))
+        output, error = self.pyboard.follow_lines(None, pull.line, max_bytes=4096)
+        pull.close()
+        self.pyboard.exit_raw_repl()
+        if error:
+            raise ampy_pyboard.PyboardError(error.strip())
+        _progress(f'Pulled: {pull.files} files, {pull.bytes} bytes ({pull.bytes_transferred} bytes transferred), {pull.files_ignored} files up-to-date.\n')
+        return pull.bytes
 
-    def put(self, source, destination=None, force=False, parents_create=True, _progress=lambda state: None):
-        """Upload file to MCU filesystem, creating parent directories."""
+    def put(self, source, destination=None, force=False, parents_create=True, atomic=True, _progress=lambda state: None):
+        """Upload file to MCU filesystem, creating parent directories (writing to a temporary file renamed into place if `atomic`), and return bytes uploaded."""
         if destination is None:
             destination = source
         with open(source, 'rb') as f:
             data = f.read()
         progress = _Progress(source, callback_for_user=_progress)
-        if not force and self.hashcache.same(destination, data):
-            _progress(f'Ign: {source}\n  -> {destination} ... up-to-date in cache, --force to override.\n')
-        else:
+        with self.session():
+            if not force and self.same(destination, data):
+                _progress(f'Ign: {source}\n  -> {destination} ... up-to-date in cache, --force to override.\n')
+                return 0
             _progress(f'Put: {source}\n  -> {destination} ... {progress.bytes} bytes\n')
             try:
+                self.manifest.invalidate()
                 progress.start()
-                self.ampy.put(destination, data, progress_cb=progress.callback_for_ampy)  # FIXME: ampy version from pip is too old to include feature progress.
+                destination_written = f'{destination}.tmp' if atomic else destination  # Note: an interrupted upload never leaves a half-written file at destination
+                if self.pyboard.webrepl:
+                    self._put_webrepl(destination_written, data, progress_cb=progress.callback_for_ampy)
+                else:
+                    self.ampy.put(destination_written, data, progress_cb=progress.callback_for_ampy)  # FIXME: ampy version from pip is too old to include feature progress.
+                if atomic:
+                    self.rename(destination_written, destination)
                 self.hashcache.add(destination, data)
+                self.hashcache.add_throughput(progress.bytes, (time.time_ns() - progress.time_start) / 10**9)
+                self.manifest.add(destination, data)
+                return progress.bytes
             except ampy_pyboard.PyboardError as e:
                 if not parents_create:
                     raise RuntimeError(f'Directory does not exist for file: {destination}')
                 elif len(e.args) > 1 and 'ENOENT' in str(e.args[2]):
                     self.mkdir(os.path.dirname(destination), parents_create=True)
                     _progress(f'\n\nCreating directory: {os.path.dirname(destination)}\n\n')
-                    return self.put(source, destination, force, parents_create, _progress)
+                    return self.put(source, destination, force, parents_create, atomic, _progress)
                 else:
                     raise
 
+    def _get_webrepl(self, filename):
+        """Read file with WebREPL binary transfer, raising errors as `ampy.files.Files.get()`."""
+        try:
+            return self.pyboard.webrepl.get(filename)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            raise RuntimeError(f'No such file: {filename}')
+
+    def _put_webrepl(self, filename, data, progress_cb):
+        """Write file with WebREPL binary transfer, raising errors as `ampy.files.Files.put()`."""
+        try:
+            self.pyboard.webrepl.put(filename, data, progress_cb=progress_cb)
+        except OSError as e:
+            if not isinstance(e.errno, int) or e.errno < 1:
+                raise
+            raise ampy_pyboard.PyboardError('exception', b'', f'OSError: [Errno {e.errno}] {errno.errorcode.get(e.errno, "")}'.encode())
+
+    def rename(self, source, destination):
+        """Rename file on MCU filesystem (replacing destination)."""
+        with self.session():
+            self.manifest.invalidate()
+            self.exec(f"""if 1:  # hack indent error
+                try:
+                    import os
+                except ImportError:
+                    import uos as os
+                os.rename({source!r}, {destination!r})
+            """)
+            self.hashcache.copy(source, destination)
+            self.hashcache.remove(source)
+            self.manifest.copy(source, destination)
+            self.manifest.remove(source)
+
+    def copy(self, source, destination):
+        """Copy file on MCU filesystem, creating parent directories (without transfer over serial)."""
+        with self.session():
+            self.manifest.invalidate()
+            self.exec(f"""if 1:  # hack indent error
+                try:
+                    import os
+                except ImportError:
+                    import uos as os
+                path = ''
+                for part in {destination!r}.split('/')[:-1]:
+                    if part:
+                        path += '/' + part
+                        try:
+                            os.mkdir(path)
+                        except OSError:
+                            pass
+                buffer = bytearray(512)
+                with open({source!r}, 'rb') as fs, open({destination!r}, 'wb') as fd:
+                    while True:
+                        n = fs.readinto(buffer)
+                        if not n:
+                            break
+                        fd.write(memoryview(buffer)[:n])
+            """)
+            self.hashcache.copy(source, destination)
+            self.manifest.copy(source, destination)
+
+    def df(self, directory='/'):
+        """Return filesystem space on MCU and usage per directory (in bytes, including subdirectories)."""
+        output = self.exec(f"""if 1:  # hack indent error
+            try:
+                import os
+            except ImportError:
+                import uos as os
+            usage = {{}}
+            def walk(directory):
+                size = 0
+                for entry in os.ilistdir(directory):
+                    path = directory.rstrip('/') + '/' + entry[0]
+                    if entry[1] & 0x4000:
+                        size += walk(path)
+                    else:
+                        size += os.stat(path)[6]
+                usage[directory] = size
+                return size
+            walk({directory!r})
+            print((tuple(os.statvfs('/')), usage))
+        """)
+        statvfs, usage = ast.literal_eval(output.strip())
+        return dict(self._statvfs(statvfs), directories=dict(sorted(usage.items())))
+
+    def space(self, filenames=[]):
+        """Return filesystem space on MCU, and sizes of `filenames` (`None` if not existing), in one round trip."""
+        output = self.exec(f"""if 1:  # hack indent error
+            try:
+                import os
+            except ImportError:
+                import uos as os
+            sizes = {{}}
+            for filename in {list(filenames)!r}:
+                try:
+                    sizes[filename] = os.stat(filename)[6]
+                except OSError:
+                    sizes[filename] = None
+            print((tuple(os.statvfs('/')), sizes))
+        """)
+        statvfs, sizes = ast.literal_eval(output.strip())
+        return dict(self._statvfs(statvfs), sizes=sizes)
+
+    def _statvfs(self, statvfs):
+        """Return `dict` of space from result of `os.statvfs()`."""
+        block_size = statvfs[1] or statvfs[0]  # f_frsize, or f_bsize
+        return {
+            'block_size': block_size,
+            'total': statvfs[2] * block_size,
+            'used': (statvfs[2] - statvfs[3]) * block_size,
+            'free': statvfs[4] * block_size}
+
+    def exec(self, command):
+        """Execute python code on MCU and return output."""
+        self.pyboard.enter_raw_repl()
+        try:
+            output = self.pyboard.exec_(command)
+        except ampy_pyboard.PyboardError as e:
+            if len(e.args) > 2:
+                raise ampy_pyboard.PyboardError(e.args[2].decode('utf-8').strip())
+            raise
+        self.pyboard.exit_raw_repl()
+        return output.decode('utf-8')
+
     def rm(self, filename):
         """Remove file from MCU filesystem."""
-        self.ampy.rm(filename)
-        self.hashcache.remove(filename)
+        with self.session():
+            self.manifest.invalidate()
+            self.ampy.rm(filename)
+            self.hashcache.remove(filename)
+            self.manifest.remove(filename)
 
     def mkdir(self, directory, parents_create=True):
         """Create directory on MCU filesystem (creating parents)."""
@@ -109,25 +373,89 @@ class Device(Configurable):
 
     def rmdir(self, filename):
         """Remove directory from MCU filesystem."""
-        try:
-            self.ampy.rmdir(filename)
-        except RuntimeError as e:
-            if filename in ['', '.'] and 'No such directory' in str(e):  # ampy rmdir . remove all files from filesystem and raise exception
-                sys.stderr.write('Deleting all files...\n')
-                self.hashcache.clear()
-            else:
-                raise
+        with self.session():
+            self.manifest.invalidate()
+            try:
+                self.ampy.rmdir(filename)
+                self.manifest.remove_directory(filename)
+            except RuntimeError as e:
+                if filename in ['', '.'] and 'No such directory' in str(e):  # ampy rmdir . remove all files from filesystem and raise exception
+                    sys.stderr.write('Deleting all files...\n')
+                    self.hashcache.clear()
+                    self.manifest.clear()
+                else:
+                    raise
 
 
-    def run(self, filename):
-        """Run python script on MCU (without storing on filesystem)."""
+    def run(self, filename, timeout=None, cache=False, mpy=False, _progress=lambda state: None):
+        """
+        Run python script on MCU (without storing on filesystem), streaming output line by line, and return output
+        (last 64KB). The script is interrupted after `timeout` seconds, or by ctrl-C.
+        With `cache`, the script is stored on MCU by content hash (compiled with mpy-cross if `mpy`) and imported from there,
+        so that it is uploaded only when changed - Note: the script then runs as a module (`__name__` is not `__main__`).
+        """
+        if not (cache or mpy):
+            with open(filename, 'rb') as f:
+                return self._run(f.read(), timeout, _progress)
+        module = self._run_cache_put(filename, mpy=mpy, _progress=_progress)
         try:
-            return self.ampy.run(filename)
+            return self._run(_RUN_CACHED.replace('{{directory}}', repr(_RUN_CACHE_DIRECTORY)).replace('{{module}}', repr(module)).encode(), timeout, _progress)
         except ampy_pyboard.PyboardError as e:
-            raise ampy_pyboard.PyboardError(str(e.args[2].decode('utf-8')))
+            if f"no module named '{module}'" not in str(e):
+                raise
+            with self.session():
+                self.manifest.invalidate()
+                for extension in ('.py', '.mpy'):  # Note: cached script was removed from MCU, upload it again
+                    self.hashcache.remove(f'{_RUN_CACHE_DIRECTORY}/{module}{extension}')
+                    self.manifest.remove(f'{_RUN_CACHE_DIRECTORY}/{module}{extension}')
+                module = self._run_cache_put(filename, mpy=mpy, _progress=_progress)
+            return self._run(_RUN_CACHED.replace('{{directory}}', repr(_RUN_CACHE_DIRECTORY)).replace('{{module}}', repr(module)).encode(), timeout, _progress)
 
-    def reset(self):
-        """Reset MCU (hard reset)."""
+    def _run(self, script, timeout=None, _progress=lambda state: None):
+        """Run `script` (bytes) on MCU, streaming output, and return output."""
+        self.pyboard.enter_raw_repl()
+        self.pyboard.exec_raw_no_follow(script)
+        output, error = self.pyboard.follow_lines(timeout, _progress)
+        self.pyboard.exit_raw_repl()
+        if error:
+            raise ampy_pyboard.PyboardError(error)
+        return output
+
+    def _run_cache_put(self, filename, mpy=False, _progress=lambda state: None):
+        """
+        Upload script `filename` to MCU run cache (compiled with mpy-cross if `mpy`, with `mpy` as arguments if list),
+        unless already there, removing previous versions of the script, and return its module name.
+        """
+        with open(filename, 'rb') as f:
+            data = f.read()
+        name = re.sub(r'\W', '_', os.path.splitext(os.path.basename(filename))[0])
+        module = f'{name}_{self.hashcache._hash(data + repr(mpy).encode())[:12]}'
+        source, extension = filename, '.py'
+        if mpy:
+            try:
+                import mpy_cross
+            except ImportError as e:
+                raise e.__class__(f'Please install mpy-cross: `pip install mpy-cross` - {e}')
+            source, extension = os.path.join('.microdeploy.build', 'run', f'{module}.mpy'), '.mpy'
+            if not os.path.exists(source):
+                os.makedirs(os.path.dirname(source), exist_ok=True)
+                if mpy_cross.run(filename, '-o', source, *(mpy if type(mpy) in [list, tuple] else [])).wait():
+                    raise RuntimeError(f'Compilation failed with mpy-cross: {filename}')
+            with open(source, 'rb') as f:
+                data = f.read()
+        destination = f'{_RUN_CACHE_DIRECTORY}/{module}{extension}'
+        with self.session():
+            if not self.same(destination, data):
+                self.manifest.invalidate()
+                removed = ast.literal_eval(self.exec(_RUN_CACHE_CLEAN.replace('{{directory}}', repr(_RUN_CACHE_DIRECTORY)).replace('{{name}}', repr(name))).strip())
+                for filename_removed in removed:
+                    self.hashcache.remove(filename_removed)
+                    self.manifest.remove(filename_removed)
+                self.put(source, destination, force=True, _progress=_progress)
+        return module
+
+    def reset(self, wait=True, timeout=10, _progress=lambda state: None):
+        """Reset MCU (hard reset), then wait until MCU is ready and return boot time (in seconds)."""
         self.pyboard.enter_raw_repl()
         self.pyboard.exec_raw_no_follow("""if 1:  # hack indent error
             try:
@@ -136,25 +464,288 @@ class Device(Configurable):
                 import machine as m
             m.reset()
         """)
+        self.pyboard.raw_repl = False  # MCU is rebooting: raw REPL must be entered again, even in session
         self.pyboard.exit_raw_repl()
+        if not wait:
+            return None
+        marker = self.config.device()['ready']
+        time_start = time.time()
+        if self.pyboard.wait_ready(marker.encode(), timeout):
+            boot_time = round(time.time() - time_start, 3)
+            _progress(f'ready in {boot_time:.2f}s ')
+            return boot_time
+        else:
+            _progress(f'not ready after {timeout}s (waiting for: {marker!r}) ')
+            return None
 
 
 # Helpers
 
+class _Pyboard(ampy_pyboard.Pyboard):
+    """
+    Extend `ampy.pyboard.Pyboard` with optional soft reset when entering raw REPL, and session support - see `Device.session()`.
+    """
+
+    def __init__(self, *args, softreset=True, **kwargs):
+        self.connect_args = (args, kwargs)
+        self._connect()
+        self.softreset = softreset
+        self.session_depth = 0
+        self.raw_repl = False
+        self.cancelled = False  # set from another thread to interrupt operation in progress - see `aio.AsyncDevice`
+
+    def exec_raw_no_follow(self, command):
+        """Same as `ampy.pyboard.Pyboard.exec_raw_no_follow()`, unless operation is cancelled."""
+        if self.cancelled:
+            raise ampy_pyboard.PyboardError('cancelled')
+        return super().exec_raw_no_follow(command)
+
+    def raw_paste_supported(self):
+        """Return whether MCU supports raw-paste mode (MicroPython >= 1.14), sending empty code if so - see `pyboard.py`."""
+        self.enter_raw_repl()
+        self.read_until(1, b'>')
+        self.serial.write(b'\x05A\x01')
+        response = self.serial.read(2)
+        if response == b'R\x01':
+            self.serial.read(2)  # window size
+            self.serial.write(b'\x04')  # end of code
+            self.read_until(1, b'\x04')
+            self.follow(10)
+        elif response == b'R\x00':  # Note: raw-paste understood but not supported, MCU waits for code (ctrl-D alone would soft reset)
+            self.serial.write(b'pass\x04')
+            self.read_until(1, b'OK')
+            self.follow(10)
+        else:  # Note: raw-paste not understood, ctrl-A entered raw REPL again
+            self.read_until(1, b'raw REPL; CTRL-B to exit\r\n')
+        self.exit_raw_repl()
+        return response == b'R\x01'
+
+    def enter_raw_repl(self):
+        """Enter raw REPL, unless already entered in session."""
+        if self.session_depth and self.raw_repl:
+            return
+        if self.softreset:
+            super().enter_raw_repl()  # Note: soft reset runs boot.py, which can take seconds
+        else:
+            self._enter_raw_repl_without_softreset()
+        self.raw_repl = True
+
+    def exit_raw_repl(self):
+        """Exit raw REPL, unless in session."""
+        if self.session_depth or not self.raw_repl:
+            return
+        super().exit_raw_repl()
+        self.raw_repl = False
+
+    def follow_lines(self, timeout=None, callback=lambda line: None, max_bytes=65536):
+        """
+        Same as `ampy.pyboard.Pyboard.follow()`, calling `callback` for each line of output as received,
+        and return tuple of output and error output (as `str`, keeping last `max_bytes` only).
+        After `timeout` seconds (or on ctrl-C, or when cancelled), the script running on MCU is interrupted (with ctrl-C).
+        """
+        time_end = time.time() + timeout if timeout else None
+        output = collections.deque()
+        output_bytes = 0
+        line, error = b'', b''
+        eofs = 0
+        interrupted = None
+        def emit(line):
+            nonlocal output_bytes
+            line = line.decode('utf-8', errors='replace')
+            callback(line)
+            output.append(line)
+            output_bytes += len(line)
+            while output_bytes > max_bytes:  # Note: memory is bounded for scripts that print forever
+                output_bytes -= len(output.popleft())
+        while eofs < 2:
+            try:
+                if self.cancelled and not interrupted:
+                    interrupted = 'cancelled'
+                    self.serial.write(b'\x03')
+                    time_end = time.time() + 2
+                elif time_end and time.time() > time_end and not interrupted:
+                    interrupted = 'timeout'
+                    self.serial.write(b'\x03')  # ctrl-C: interrupt script on MCU
+                    time_end = time.time() + 2
+                elif time_end and time.time() > time_end:
+                    raise ampy_pyboard.PyboardError(f'timeout waiting for script to end after interrupt')
+                n = self.serial.inWaiting()
+                if not n:
+                    time.sleep(0.01)
+                    continue
+                data = self.serial.read(n)
+            except KeyboardInterrupt:
+                if interrupted:
+                    raise
+                interrupted = 'ctrl-C'
+                self.serial.write(b'\x03')  # forward ctrl-C to MCU
+                time_end = time.time() + 2
+                continue
+            while data:
+                if eofs == 2:
+                    self.serial.unread(data)  # Note: bytes after output (eg. prompt `>`) are left for next command
+                    break
+                chunk, eof, data = data.partition(b'\x04')
+                if eofs == 0:
+                    *lines, line = (line + chunk).split(b'\n')
+                    for line_complete in lines:
+                        emit(line_complete + b'\n')
+                    if len(line) > 4096 or (eof and line):
+                        emit(line)
+                        line = b''
+                else:
+                    error = (error + chunk)[-max_bytes:]
+                if eof:
+                    eofs += 1
+        if interrupted == 'ctrl-C':
+            raise KeyboardInterrupt()
+        if interrupted == 'cancelled':
+            raise ampy_pyboard.PyboardError('cancelled: script interrupted')
+        if interrupted:
+            raise ampy_pyboard.PyboardError(f'timeout: script interrupted after {timeout}s')
+        return ''.join(output), error.decode('utf-8', errors='replace')
+
+    def wait_ready(self, marker, timeout=10):
+        """
+        Return `True` as soon as `marker` is received from MCU, or `False` after `timeout` seconds.
+        Reconnect as soon as the port reappears, if it disappeared when MCU was reset (eg. USB CDC re-enumeration).
+        """
+        time_end = time.time() + timeout
+        data = b''
+        while time.time() < time_end:
+            try:
+                n = self.serial.inWaiting()
+                if n:
+                    data = (data + self.serial.read(n))[-1024:]  # Note: keep memory bounded on boot messages
+                    if marker in data:
+                        return True
+                else:
+                    time.sleep(0.01)
+            except OSError:  # Note: `serial.SerialException` extends `OSError`
+                self._reconnect(time_end)
+        return False
+
+    def _reconnect(self, time_end):
+        """Reopen port as soon as it reappears, until `time_end`."""
+        try:
+            self.close()
+        except OSError:
+            pass
+        while time.time() < time_end:
+            try:
+                self._connect()
+                return
+            except (ampy_pyboard.PyboardError, OSError):
+                time.sleep(0.05)
+
+    def _connect(self):
+        """Open port, or WebREPL connection for port like `ws://192.168.4.1:8266`."""
+        args, kwargs = self.connect_args
+        if str(args[0]).startswith(('ws://', 'wss://')):
+            ampy_pyboard._rawdelay = kwargs.get('rawdelay', 0)  # Note: module global, as set by `ampy.pyboard.Pyboard.__init__()`
+            self.serial = webrepl_module.WebREPL(args[0], password=kwargs.get('password'))
+        else:
+            ampy_pyboard.Pyboard.__init__(self, *args, **kwargs)
+        self.serial = _PushbackSerial(self.serial)
+
+    @property
+    def webrepl(self):
+        """Return `webrepl.WebREPL` connection, or `None` for serial port."""
+        return self.serial.serial if isinstance(self.serial.serial, webrepl_module.WebREPL) else None
+
+    def _enter_raw_repl_without_softreset(self):
+        """Same as `ampy.pyboard.Pyboard.enter_raw_repl()`, without ctrl-D (soft reset)."""
+        self.serial.write(b'\r\x03')  # ctrl-C twice: interrupt any running program
+        time.sleep(0.1)
+        self.serial.write(b'\x03')
+        time.sleep(0.1)
+        n = self.serial.inWaiting()  # flush input
+        while n > 0:
+            self.serial.read(n)
+            n = self.serial.inWaiting()
+        self.serial.write(b'\r\x01')  # ctrl-A: enter raw REPL
+        data = self.read_until(1, b'raw REPL; CTRL-B to exit\r\n')  # Note: prompt `>` is left for `exec_raw_no_follow()`
+        if not data.endswith(b'raw REPL; CTRL-B to exit\r\n'):
+            raise ampy_pyboard.PyboardError(f'could not enter raw repl: {data}')
+
+
+class _PushbackSerial(object):
+    """Serial port with bytes pushed back, read before bytes from port (other attributes are the port's)."""
+
+    def __init__(self, serial):
+        self.serial = serial
+        self.pushback = b''
+
+    def unread(self, data):
+        """Push back `data`, to be read again."""
+        self.pushback = data + self.pushback
+
+    def inWaiting(self):
+        return len(self.pushback) + self.serial.inWaiting()
+
+    @property
+    def in_waiting(self):
+        return self.inWaiting()
+
+    def read(self, size=1):
+        data, self.pushback = self.pushback[:size], self.pushback[size:]
+        if len(data) < size:
+            data += self.serial.read(size - len(data))
+        return data
+
+    @property
+    def timeout(self):
+        return self.serial.timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self.serial.timeout = timeout
+
+    def __getattr__(self, name):
+        return getattr(self.serial, name)
+
+
 import hashlib
+import sqlite3
 import json
 
 class _HashCache(object):
     """
-    Pseudo-cache for files on MCU (using hashes).
-    """ 
-    # FIXME: when config will multiple devices, the hashcache must handle multiple caches,
-    #   ie. one additional level in hashcash json structure;
-    #   also, instanciable class could be nice.
+    Pseudo-cache for files on MCU (using hashes), stored per device in sqlite database `cachefile`,
+    along with pushes history and measured throughput.
+    """
+    # Note: WAL journal mode lets concurrent pushes to several devices share the database.
 
-    def __init__(self, device:Device, cachefile='.microdeploy.hashcache'):
+    def __init__(self, device:Device, cachefile='.microdeploy.db', jsonfile='.microdeploy.hashcache'):
         self.device = device
         self.cachefile = cachefile
+        self.jsonfile = jsonfile  # legacy json cache, migrated on first use
+        self._connection = None
+
+    @property
+    def db(self):
+        """Return singleton `sqlite3.Connection` to `cachefile`, creating schema and migrating legacy json cache."""
+        if not self._connection:
+            if not os.path.exists(self.cachefile):
+                sys.stderr.write(f'Creating file: {self.cachefile}\n')
+            connection = sqlite3.connect(self.cachefile, timeout=30, isolation_level=None)  # Note: autocommit
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS files (device TEXT, filename TEXT, hash TEXT, PRIMARY KEY (device, filename));
+                CREATE TABLE IF NOT EXISTS pushes (id INTEGER PRIMARY KEY, device TEXT, package TEXT, time REAL, duration REAL, files INTEGER, files_total INTEGER, bytes INTEGER, errors INTEGER);
+                CREATE TABLE IF NOT EXISTS throughput (device TEXT PRIMARY KEY, bytes INTEGER, seconds REAL);
+                CREATE INDEX IF NOT EXISTS pushes_device ON pushes (device, time);
+                CREATE TABLE IF NOT EXISTS inventory (serial_number TEXT PRIMARY KEY, port TEXT, unique_id TEXT, info TEXT, time REAL);
+            """)
+            self._connection = connection
+            self._migrate()
+        return self._connection
+
+    @property
+    def device_id(self):
+        """Return key of device in database: its resolved port (or configured address, if not found)."""
+        return str(self.device.port or self.device.config.device()['port'])
 
     def same(self, mcu_filename, content_to_compare):
         """Return `True` if hash in cache for mcu_filename matches hash of `content_to_compare`."""
@@ -163,22 +754,57 @@ class _HashCache(object):
     def get(self, mcu_filename):
         """Return hash from cache for `mcu_filename`, or return None."""
         mcu_filename = self._mcu_filename(mcu_filename)
-        return self._read().get(mcu_filename)
+        try:
+            row = self.db.execute('SELECT hash FROM files WHERE device=? AND filename=?', (self.device_id, mcu_filename)).fetchone()
+        except sqlite3.Error as e:
+            sys.stderr.write(f'Bypassing cache read: {self.cachefile}: {e}\n')
+            return None
+        return row['hash'] if row else None
 
     def add(self, mcu_filename, file_contents):
         """Add hash to cache for `mcu_filename` and `file_contents`."""
-        hashcache = self._read()
         mcu_filename = self._mcu_filename(mcu_filename)
-        hashcache[mcu_filename] = self._hash(file_contents)
-        self._write(hashcache)
+        self._execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?)', (self.device_id, mcu_filename, self._hash(file_contents)))
+
+    def copy(self, mcu_source, mcu_destination):
+        """Copy hash in cache from `mcu_source` to `mcu_destination`."""
+        hash = self.get(mcu_source)
+        if hash:
+            self._execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?)', (self.device_id, self._mcu_filename(mcu_destination), hash))
+        else:
+            self.remove(mcu_destination)
 
     def remove(self, mcu_filename):
         """Remove hash from cache for `mcu_filename`."""
-        hashcache = self._read()
         mcu_filename = self._mcu_filename(mcu_filename)
-        if mcu_filename in hashcache:
-            del hashcache[mcu_filename]
-            self._write(hashcache)
+        self._execute('DELETE FROM files WHERE device=? AND filename=?', (self.device_id, mcu_filename))
+
+    def add_push(self, package, time_start, files, files_total, bytes, errors):
+        """Record a push of `package` to device in history."""
+        self._execute('INSERT INTO pushes (device, package, time, duration, files, files_total, bytes, errors) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (self.device_id, package, time_start, time.time() - time_start, files, files_total, bytes, errors))
+
+    def add_throughput(self, bytes, seconds):
+        """Add `bytes` uploaded in `seconds` to measured throughput of device."""
+        self._execute('INSERT INTO throughput VALUES (?, ?, ?) ON CONFLICT (device) DO UPDATE SET bytes=bytes+excluded.bytes, seconds=seconds+excluded.seconds',
+            (self.device_id, bytes, seconds))
+
+    def history(self, limit=20, all_devices=False):
+        """Return last pushes (for all devices if `all_devices`) and measured throughput, per device."""
+        where, args = ('', ()) if all_devices else ('WHERE device=?', (self.device_id,))
+        pushes = self.db.execute(f'SELECT * FROM pushes {where} ORDER BY time DESC LIMIT ?', args + (limit,)).fetchall()
+        throughput = self.db.execute(f'SELECT * FROM throughput {where}', args).fetchall()
+        return {
+            'pushes': [dict(push, time=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(push['time'])), duration=round(push['duration'], 1)) for push in pushes],
+            'throughput': {row['device']: f"{row['bytes'] * 8 / row['seconds']:.0f} bits/s" for row in throughput if row['seconds']}}
+
+    def inventory(self):
+        """Return devices found by `microdeploy inventory`, keyed by USB serial number (or port, if no serial number)."""
+        rows = self.db.execute('SELECT * FROM inventory ORDER BY port').fetchall()
+        return [dict(row, info=json.loads(row['info'])) for row in rows]
+
+    def inventory_add(self, serial_number, port, info):
+        self._execute('INSERT OR REPLACE INTO inventory VALUES (?, ?, ?, ?, ?)', (serial_number, port, info.get('unique_id'), json.dumps(info), time.time()))
 
     def clear(self):
         """Remove cache file."""
@@ -220,38 +846,49 @@ class _HashCache(object):
             sys.stderr.write(f'{hash} {filename}  (deleted)\n')  # for information
 
     def _write(self, hashcache):
-        """Write `hashcache` to file `_HashCache.cachefile`, replacing existing content."""
+        """Write `hashcache` for device to database `_HashCache.cachefile`, replacing existing content."""
         try:
-            with open(self.cachefile, 'w') as f:
-                f.write(json.dumps(hashcache))
-        except PermissionError as e:
-            sys.stderr.write(f'Bypassing cache write: file not writable: {self.cachefile}\n')
+            with self.db:
+                self.db.execute('BEGIN')
+                self.db.execute('DELETE FROM files WHERE device=?', (self.device_id,))
+                self.db.executemany('INSERT INTO files VALUES (?, ?, ?)', [(self.device_id, filename, hash) for filename, hash in hashcache.items()])
+        except sqlite3.Error as e:
+            sys.stderr.write(f'Bypassing cache write: {self.cachefile}: {e}\n')
 
     def _read(self, failsafe=True):
-        """Return hashcache content from file `_HashCache.cachefile`"""
+        """Return hashcache content for device from database `_HashCache.cachefile`."""
         try:
-            try:
-                with open(self.cachefile) as f:
-                    cache = json.loads(f.read())  # actual loading of file
-                    if type(cache) is dict:
-                        return cache
-                    else:
-                        raise ValueError(f'Bypassing cache: invlid cache structure in: {self.cachefile}')
-            except FileNotFoundError as e:
-                sys.stderr.write(f'Creating file: {self.cachefile}\n')
-                return {}
-            except json.decoder.JSONDecodeError as e:
-                sys.stderr.write(f'Clearing hashcache: invalid json in: {self.cachefile})\n')
-                return {}
-            except PermissionError as e:
-                raise PermissionError(f'Bypassing cache read: file not readable: {self.cachefile}')
+            rows = self.db.execute('SELECT filename, hash FROM files WHERE device=? ORDER BY filename', (self.device_id,)).fetchall()
+            return {row['filename']: row['hash'] for row in rows}
         except Exception as e:
             if failsafe:
-                sys.stderr.write(f'{e}\n')
+                sys.stderr.write(f'Bypassing cache read: {self.cachefile}: {e}\n')
                 return {}
             else:
                 raise e.__class__(f'Cache error: {e}')
 
+    def _execute(self, sql, args):
+        """Execute `sql` on database, bypassing cache write on error."""
+        try:
+            self.db.execute(sql, args)
+        except sqlite3.Error as e:
+            sys.stderr.write(f'Bypassing cache write: {self.cachefile}: {e}\n')
+
+    def _migrate(self):
+        """Migrate legacy json cache file `jsonfile` to database (for the configured device), once."""
+        try:
+            with open(self.jsonfile) as f:
+                hashcache = json.loads(f.read())
+        except (FileNotFoundError, json.decoder.JSONDecodeError, PermissionError):
+            return
+        if type(hashcache) is dict and not self._read():
+            self._write(hashcache)
+            sys.stderr.write(f'Cache migrated: {self.jsonfile} -> {self.cachefile} (for device: {self.device_id})\n')
+        try:
+            os.rename(self.jsonfile, f'{self.jsonfile}.migrated')
+        except PermissionError:
+            pass
+
     def _hash(self, bytes):
         return hashlib.sha256(bytes).hexdigest()
 
@@ -264,6 +901,274 @@ class _HashCache(object):
                 or (not os.path.exists(self.cachefile) and os.access('.', os.W_OK)))  # file not exists and containing directory is writable
 
 
+class _Manifest(object):
+    """
+    Manifest of files on MCU, stored on MCU filesystem in `manifestfile` as `{filename: [hash, size, deploy_id]}`.
+
+    The manifest is read once per session (in one round trip) and written at the end of the session,
+    so that any host pushing to MCU can skip up-to-date files - the hashcache is used outside sessions,
+    and for files not in manifest when no manifest was found on MCU.
+    The file is removed from MCU before files are modified (see `invalidate()`), so that an interrupted session
+    never leaves a stale manifest: files are then uploaded again.
+    """
+
+    def __init__(self, device:Device, manifestfile='/.microdeploy.manifest'):
+        self.device = device
+        self.manifestfile = manifestfile
+        self.unload()
+
+    def read(self):
+        """Return manifest content from MCU."""
+        try:
+            return json.loads(self.device.get(self.manifestfile))
+        except RuntimeError as e:
+            if 'No such file' not in str(e): raise
+            return {}
+        except ValueError:
+            sys.stderr.write(f'Bypassing manifest: invalid json in: {self.manifestfile} (on MCU)\n')
+            return {}
+
+    def load(self):
+        """Read manifest from MCU, unless loaded in this session."""
+        if self.manifest is None:
+            self.manifest = self.read()
+            self.stored = self.found = bool(self.manifest)
+            self.deploy_id = time.strftime('%Y%m%d%H%M%S')
+
+    def same(self, mcu_filename, content_to_compare):
+        """
+        Return `True` if hash in manifest for `mcu_filename` matches hash of `content_to_compare`, or `None` if unknown:
+        outside session, or not in manifest when no manifest was found on MCU (eg. after an interrupted push).
+        """
+        if not self.device.pyboard.session_depth:
+            return None
+        self.load()
+        entry = self.manifest.get(self._mcu_filename(mcu_filename))
+        if not entry and not self.found:
+            return None
+        return bool(entry) and entry[0] == self.device.hashcache._hash(content_to_compare)
+
+    def invalidate(self):
+        """Load manifest and remove its file from MCU (until saved), before files are modified on MCU - in session."""
+        self.load()
+        if self.stored:
+            self.device.exec(f"import os\nos.remove({self.manifestfile!r})")
+            self.stored = False
+            self.modified = True  # Note: to be written again, even if no file is modified
+
+    def add(self, mcu_filename, file_contents):
+        """Add entry to manifest for `mcu_filename` and `file_contents` (if loaded)."""
+        if self.manifest is not None:
+            self.manifest[self._mcu_filename(mcu_filename)] = [self.device.hashcache._hash(file_contents), len(file_contents), self.deploy_id]
+            self.modified = True
+
+    def copy(self, mcu_source, mcu_destination):
+        """Copy entry in manifest from `mcu_source` to `mcu_destination` (if loaded)."""
+        if self.manifest is not None:
+            entry = self.manifest.get(self._mcu_filename(mcu_source))
+            if entry:
+                self.manifest[self._mcu_filename(mcu_destination)] = entry[:2] + [self.deploy_id]
+            else:
+                self.manifest.pop(self._mcu_filename(mcu_destination), None)
+            self.modified = True
+
+    def remove(self, mcu_filename):
+        """Remove entry from manifest for `mcu_filename` (if loaded)."""
+        if self.manifest is not None and self.manifest.pop(self._mcu_filename(mcu_filename), None):
+            self.modified = True
+
+    def remove_directory(self, mcu_directory):
+        """Remove entries from manifest for files in `mcu_directory` (if loaded)."""
+        prefix = self._mcu_filename(mcu_directory).rstrip('/') + '/'
+        for mcu_filename in [mcu_filename for mcu_filename in self.manifest or {} if mcu_filename.startswith(prefix)]:
+            self.remove(mcu_filename)
+
+    def clear(self):
+        """Clear manifest (if loaded) - Note: file on MCU is removed with all files."""
+        if self.manifest is not None:
+            self.manifest = {}
+            self.stored = False
+            self.modified = True
+
+    def save(self):
+        """Write manifest to MCU if modified, replacing existing file atomically."""
+        if self.manifest is None or not self.modified:
+            return
+        self.device.ampy.put(f'{self.manifestfile}.tmp', json.dumps(self.manifest, separators=(',', ':')).encode())
+        self.device.exec(f"import os\nos.rename({self.manifestfile + '.tmp'!r}, {self.manifestfile!r})")
+        self.stored = True
+        self.modified = False
+
+    def unload(self):
+        """Forget manifest content, to be read again from MCU in next session."""
+        self.manifest = None
+        self.stored = self.found = False
+        self.modified = False
+        self.deploy_id = None
+
+    def _mcu_filename(self, mcu_filename):
+        return os.path.join('/', mcu_filename)  # file format like `ls()` always starting with /
+
+
+_PROBE = """if 1:  # hack indent error
+    try:
+        import os
+    except ImportError:
+        import uos as os
+    import sys
+    try:
+        import machine
+        import binascii
+        unique_id = binascii.hexlify(machine.unique_id()).decode()
+    except Exception:
+        unique_id = None
+    uname = os.uname()
+    print(({
+        'unique_id': unique_id,
+        'implementation': sys.implementation.name,
+        'version': '.'.join(str(part) for part in sys.implementation.version[:3]),
+        'firmware': uname.version,
+        'machine': uname.machine,
+        'platform': sys.platform}, tuple(os.statvfs('/'))))
+"""
+
+
+_RUN_CACHE_DIRECTORY = '/.microdeploy/run'  # scripts stored by `Device.run(cache=True)`
+
+_RUN_CACHED = """if 1:  # hack indent error
+    import sys
+    sys.path.insert(0, {{directory}})
+    try:
+        __import__({{module}})
+    finally:
+        sys.path.remove({{directory}})
+        sys.modules.pop({{module}}, None)
+"""
+
+_RUN_CACHE_CLEAN = """if 1:  # hack indent error
+    try:
+        import os
+    except ImportError:
+        import uos as os
+    removed = []
+    try:
+        for filename in os.listdir({{directory}}):
+            if filename.rsplit('.', 1)[0][:-13] == {{name}}:  # Note: previous versions of script, named `NAME_HASH`
+                os.remove({{directory}} + '/' + filename)
+                removed.append({{directory}} + '/' + filename)
+    except OSError:
+        pass
+    print(removed)
+"""
+
+
+_PULL = """if 1:  # hack indent error
+    try:
+        import os
+    except ImportError:
+        import uos as os
+    import binascii
+    import hashlib
+    class Output:
+        def write(self, data):
+            print(binascii.b2a_base64(data).decode().strip())
+            return len(data)
+    buffer = bytearray(512)  # Note: base64 lines fit in host line buffer
+    def send(path, size):
+        print('F', size, path[len(directory):].lstrip('/'))
+        output = Output()
+        if compress:
+            try:
+                import deflate
+                output = deflate.DeflateIO(output, deflate.ZLIB)
+            except (ImportError, AttributeError):
+                raise ImportError('Compression not available on MCU: requires module `deflate` with compression')
+        with open(path, 'rb') as f:
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                output.write(memoryview(buffer)[:n])
+        if compress:
+            output.close()
+        print('E')
+    def walk(path):
+        for entry in os.ilistdir(path):
+            child = path.rstrip('/') + '/' + entry[0]
+            if entry[1] & 0x4000:
+                print('D', child[len(directory):].lstrip('/'))
+                walk(child)
+                continue
+            hash = hashlib.sha256()
+            size = 0
+            with open(child, 'rb') as f:
+                while True:
+                    n = f.readinto(buffer)
+                    if not n:
+                        break
+                    hash.update(memoryview(buffer)[:n])
+                    size += n
+            if binascii.hexlify(hash.digest()).decode() == hashes.get(child[len(directory):].lstrip('/')):
+                print('S', child[len(directory):].lstrip('/'))
+            else:
+                send(child, size)
+    directory = {{directory}}
+    hashes = {{hashes}}
+    compress = {{compress}}
+    walk(directory)
+"""
+
+
+class _Pull(object):
+    """
+    Write files streamed by `_PULL` script into `destination` (as lines: `D path`, `S path`, `F size path`, base64 data, `E`),
+    to a temporary file renamed into place when complete.
+    """
+    def __init__(self, destination, compress, callback):
+        self.destination = destination
+        self.compress = compress
+        self.callback = callback
+        self.file = None
+        self.files = self.files_ignored = self.bytes = self.bytes_transferred = 0
+
+    def line(self, line):
+        line = line.rstrip('\r\n')
+        if self.file:
+            if line == 'E':
+                if self.decompressor:
+                    self.file.write(self.decompressor.flush())
+                self.file.close()
+                os.replace(f'{self.filename}.tmp', self.filename)
+                self.file = None
+                self.files += 1
+            else:
+                data = base64.b64decode(line)
+                self.bytes_transferred += len(data)
+                data = self.decompressor.decompress(data) if self.decompressor else data
+                self.bytes += len(data)
+                self.file.write(data)
+        elif line.startswith('D '):
+            os.makedirs(self._filename(line[2:]), exist_ok=True)
+        elif line.startswith('S '):
+            self.callback(f'Ign: {line[2:]} ... up-to-date.\n')
+            self.files_ignored += 1
+        elif line.startswith('F '):
+            size, path = line[2:].split(' ', 1)
+            self.callback(f'Get: {path} ... {size} bytes\n')
+            self.filename = self._filename(path)
+            os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+            self.file = open(f'{self.filename}.tmp', 'wb')
+            self.decompressor = zlib.decompressobj() if self.compress else None
+
+    def close(self):
+        if self.file:  # Note: interrupted transfer
+            self.file.close()
+            os.remove(f'{self.filename}.tmp')
+
+    def _filename(self, path):
+        return os.path.join(self.destination, *path.split('/'))
+
+
 class _Progress(object):
     """
     Link callback of `ampy.files.Files.put(progress_cb)` to `callback of device.put(_progess)`.
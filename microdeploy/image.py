@@ -0,0 +1,123 @@
+"""
+Microdeploy Image builder.
+
+Build filesystem images (littlefs v2, fat) from files, for writing to MCU flash partition in one operation.
+"""
+
+import os
+
+FORMATS = ('littlefs', 'fat')
+
+
+def build(filename: str, files: dict, size: int, format: str = 'littlefs', block_size: int = None) -> dict:
+    """
+    Write image `filename` of filesystem `format` having `size` bytes, containing `files` (`dict` of destination -> bytes),
+    then verify image by reading files back, and return image information.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Image format not supported: {format} - formats available: {', '.join(FORMATS)}")
+    block_size = block_size or (4096 if format == 'littlefs' else 512)
+    if size % block_size:
+        raise ValueError(f'Image size must be a multiple of block size: {size} % {block_size}')
+    files = {'/' + destination.strip('/'): data for destination, data in files.items()}
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    if format == 'littlefs':
+        _build_littlefs(filename, files, size, block_size)
+    else:
+        _build_fat(filename, files, size, block_size)
+    verify(filename, files, format, block_size)
+    return {
+        'image': filename,
+        'format': format,
+        'size': size,
+        'block_size': block_size,
+        'files': len(files),
+        'bytes': sum(len(data) for data in files.values())}
+
+
+def verify(filename: str, files: dict, format: str = 'littlefs', block_size: int = None):
+    """Raise if image `filename` does not contain exactly `files` (`dict` of destination -> bytes)."""
+    block_size = block_size or (4096 if format == 'littlefs' else 512)
+    files = {'/' + destination.strip('/'): data for destination, data in files.items()}
+    if format == 'littlefs':
+        files_read = _read_littlefs(filename, block_size)
+    else:
+        files_read = _read_fat(filename)
+    for destination, data in files.items():
+        if files_read.get(destination) != data:
+            raise RuntimeError(f'Image verification failed: {filename}: file differs: {destination}')
+    for destination in set(files_read) - set(files):
+        raise RuntimeError(f'Image verification failed: {filename}: unexpected file: {destination}')
+
+
+# Helpers
+
+def _littlefs(**kwargs):
+    """Return `littlefs.LittleFS`, configured as on MicroPython (see `vfs_lfsx.c`)."""
+    try:
+        import littlefs
+    except ImportError as e:
+        raise e.__class__(f'Please install littlefs-python: `pip install littlefs-python` - {e}')
+    return littlefs.LittleFS(read_size=32, prog_size=32, lookahead_size=32, **kwargs)
+
+
+def _build_littlefs(filename, files, size, block_size):
+    fs = _littlefs(block_size=block_size, block_count=size // block_size)
+    for destination, data in files.items():
+        if os.path.dirname(destination) != '/':
+            fs.makedirs(os.path.dirname(destination), exist_ok=True)
+        with fs.open(destination, 'wb') as f:
+            f.write(data)
+    with open(filename, 'wb') as f:
+        f.write(fs.context.buffer)
+
+
+def _read_littlefs(filename, block_size):
+    with open(filename, 'rb') as f:
+        buffer = bytearray(f.read())
+    fs = _littlefs(block_size=block_size, block_count=len(buffer) // block_size, mount=False)
+    fs.context.buffer = buffer
+    fs.mount()
+    files = {}
+    for directory, directories, filenames in fs.walk('/'):
+        for name in filenames:
+            path = os.path.join(directory, name)
+            with fs.open(path, 'rb') as f:
+                files[path] = f.read()
+    return files
+
+
+def _pyfatfs():
+    """Return modules `pyfatfs.PyFat` and `pyfatfs.PyFatFS`."""
+    try:
+        from pyfatfs import PyFat, PyFatFS
+    except ImportError as e:
+        raise e.__class__(f'Please install pyfatfs: `pip install pyfatfs` - {e}')
+    return PyFat, PyFatFS
+
+
+def _build_fat(filename, files, size, sector_size):
+    PyFat, PyFatFS = _pyfatfs()
+    with open(filename, 'wb') as f:
+        f.truncate(size)
+    fat_type = PyFat.PyFat.FAT_TYPE_FAT12 if size < 16 * 2**20 else PyFat.PyFat.FAT_TYPE_FAT16 if size < 2**31 else PyFat.PyFat.FAT_TYPE_FAT32
+    pyfat = PyFat.PyFat()
+    pyfat.mkfs(filename, fat_type, size=size, sector_size=sector_size, label='MICROPY')
+    pyfat.close()
+    fs = PyFatFS.PyFatFS(filename)
+    try:
+        for destination, data in files.items():
+            if os.path.dirname(destination) != '/':
+                fs.makedirs(os.path.dirname(destination), recreate=True)
+            fs.writebytes(destination, data)
+    finally:
+        fs.close()
+
+
+def _read_fat(filename):
+    PyFat, PyFatFS = _pyfatfs()
+    fs = PyFatFS.PyFatFS(filename, read_only=True)
+    try:
+        return {path: fs.readbytes(path) for path in fs.walk.files('/')}
+    finally:
+        fs.close()
@@ -3,7 +3,13 @@ Microdeploy Package manager.
 """
 
 from . import device
+from . import source as source_module
+from . import image as image_module
 from .config import Configurable
+import contextlib
+import hashlib
+import shutil
+import ast
 import re
 import os
 import time  # FIXME
@@ -14,6 +20,9 @@ class Package(Configurable):
     def __init__(self, config):
         super().__init__(config)
         self.device = device.Device(self.config)
+        self.journal = _Journal()
+        self.builddir = '.microdeploy.build'  # files generated from sources (cached), eg. minified
+        self.minified_bytes_saved = 0
 
     def names(self):
         """Return packages names."""
@@ -23,77 +32,621 @@ class Package(Configurable):
         """Return packages files."""
         return self.config.package_files(name)
 
-    def push(self, name, force=False, noput=False, norun=False, nofail=False, _progress=lambda state: None):
-        """Upload package files to MCU."""
-        files = self.config.package_files(name)
-        count = 0
-        _progress(f'Deploying package: {name}: {len(files)} files -> MCU...\n\n')
-        if not noput:
-            for source, destination in files:
-                try:
-                    mpycross_version = None  # FIXME: Move this outside loop `for`.
-                    mpycross_args = self.config.config['packages'][name].get('mpy', False)
-                    if mpycross_args and source.endswith('.py') and destination != 'main.py':
-                        if not mpycross_version:
-                            try:
-                                import mpy_cross
-                                import subprocess
-                                mpycross_version = mpy_cross.run('--version', stdout=subprocess.PIPE).communicate()[0].decode().strip()
-                            except Exception as e:
-                                raise e.__class__(f'Please install mpy-cross: `pip install mpy-cross` - {e}')
-                        mpycross_args = mpycross_args if type(mpycross_args) in [list, tuple] else []#'-march=xtensawin']#, '-X', 'emit=native']
-                        mpy_cross.run(source, *mpycross_args)
-                        source = re.sub('\.py$', '.mpy', source)
-                        destination = re.sub('\.py$', '.mpy', destination)
-                        time.sleep(.1)  # FIXME: Fixes sometimes .mpy file is not found (but exists on disk)
-                        print(f'Compiled {source} to destination {destination} - using `mpy-cross {" ".join(mpycross_args)}` (with version: {mpycross_version})')
-                        self.device.put(source, destination, parents_create=True, force=force, _progress=_progress)
-                        os.remove(source)  # .mpy file
-                    else:
-                        self.device.put(source, destination, parents_create=True, force=force, _progress=_progress)
-                    count += 1
-                    _progress('\n')
-                except Exception as e:
-                    if nofail:
-                        _progress(f'ERROR: {e.__class__.__name__}: {e}\n')
-                    else:
-                        raise
-        else:
-            _progress(f'Put: Skipping.\n\n')
+    def push(self, name, force=False, noput=False, norun=False, nofail=False, resume=False, staged=False, _progress=lambda state: None):
+        """
+        Upload package files to MCU (with `resume`, continue an interrupted push from journal).
 
-        files_to_run = self.config.config['packages'][name].get('run', [])
-        for file_to_run in files_to_run:
-            _progress(f'Run: {file_to_run}... ')
-            if norun:
-                _progress('skipping.\n')
+        With `staged` (or package config `staged: true`), upload to the inactive slot directory on MCU,
+        then switch the active slot and reset MCU - see `_STAGED_BOOT`.
+        """
+        staged = staged or self.config.config['packages'][name].get('staged', False)
+        if staged:
+            slot_active, slot = self._slots()
+            _progress(f'Staging package: {name} in slot: {slot} (active slot: {slot_active})\n')
+        journal = self.journal.read(name, self.device.hashcache.device_id) if resume else None
+        if journal:
+            files = [tuple(file) for file in journal['files']]  # Note: manifest is not walked again
+            done = journal['done']
+            _progress(f'Resuming package: {name}: {len(done)}/{len(files)} files already pushed, from journal: {self.journal.journalfile}\n')
+        else:
+            files = self._files(name)
+            if staged:
+                files = [(source, f"/{slot}/{destination.lstrip('/')}") for source, destination in files]  # Note: absolute, MCU runs from active slot (see `_STAGED_BOOT`)
+            done = []
+            if not noput:
+                self.journal.write(name, self.device.hashcache.device_id, files, done)
+        count = len(done)
+        self.minified_bytes_saved = 0
+        _progress(f'Deploying package: {name}: {len(files) - count} files -> MCU...\n\n')
+        with self.device.session(), self._record(name) as record:  # Note: interrupt running program once, instead of for every file
+            record['files_total'] = len(files)
+            if not noput:
+                self._check_space(name, [file for file in files if file[1] not in done], force=force, nofail=nofail, _progress=_progress)
+                for source, destination in files:
+                    if destination in done:
+                        continue
+                    try:
+                        if not (staged and not force and self._copy_from_slot(name, source, destination, slot, slot_active, _progress=_progress)):
+                            record['bytes'] += self._put(name, source, destination, force=force, _progress=_progress)
+                        record['files'] += 1
+                        count += 1
+                        done.append(destination)
+                        self.journal.write(name, self.device.hashcache.device_id, files, done)
+                        _progress('\n')
+                    except Exception as e:
+                        if nofail:
+                            record['errors'] += 1
+                            _progress(f'ERROR: {e.__class__.__name__}: {e}\n')
+                        else:
+                            raise
             else:
-                _progress('\n')
-                file_to_run = self.config.make_relative_to_configfile(file_to_run)
-                _progress('---8<---------\n')
-                self.device.run(file_to_run)
-                _progress('--------->8---\n')
+                _progress(f'Put: Skipping.\n\n')
 
-        if self.config.config['packages'][name].get('reset', False):
-            _progress(f'Reset MCU... ')
-            self.device.reset()
-            _progress(f'done.\n')
+            if staged and not noput:
+                if count == len(files):
+                    _progress(f'Switch active slot: {slot_active} -> {slot}, reset MCU... ')
+                    self._switch_slot(slot, _progress=_progress)
+                    self.device.reset(_progress=_progress)
+                    _progress(f'done.\n\n')
+                else:
+                    _progress(f'WARNING: Not switching active slot: {slot_active} -> {slot}: package not completely pushed !\n\n')
 
+            files_to_run = self.config.config['packages'][name].get('run', [])
+            for file_to_run in files_to_run:
+                _progress(f'Run: {file_to_run}... ')
+                if norun:
+                    _progress('skipping.\n')
+                else:
+                    _progress('\n')
+                    file_to_run = self.config.make_relative_to_configfile(file_to_run)
+                    _progress('---8<---------\n')
+                    self.device.run(file_to_run, timeout=self.config.config['packages'][name].get('timeout'), **self._run_cache(name), _progress=_progress)
+                    _progress('--------->8---\n')
+
+            if self.config.config['packages'][name].get('reset', False) and not (staged and not noput):
+                _progress(f'Reset MCU... ')
+                self.device.reset(_progress=_progress)  # Note: single reset at the end of session
+                _progress(f'done.\n')
+
+        if count == len(files):
+            self.journal.clear()
         _progress('\n')
         if count == len(files) or noput:
             _progress(f"OK: Pushed to MCU {count}/{len(files)} files from package: {name}{' (skipped by --noput)' if noput else ''}.\n")
         if not noput and count != len(files):
-            _progress(f'WARNING: Only {count}/{len(files)} files uploaded from package: {name} !\n')
+            _progress(f'WARNING: Only {count}/{len(files)} files uploaded from package: {name} ! (use --resume to continue)\n')
+        if self.config.config['packages'][name].get('minify', False):
+            _progress(f'Minified: saved {self.minified_bytes_saved} bytes in package: {name}.\n')
         if files_to_run:
             _progress(f"Ran on MCU: {files_to_run}{ '(skipped by --norun)' if norun else ''}.\n")
 
+    def watch(self, name, run=False, reset=False, interval=0.1, debounce=0.2, _progress=lambda state: None):
+        """Watch package files and upload changed files to MCU, until interrupted (ctrl-C)."""
+        files = self._files(name)  # Note: manifest is resolved once
+        mtimes = {source: self._mtime(source) for source, destination in files}
+        def changed():
+            return [(source, destination) for source, destination in files if self._mtime(source) != mtimes[source]]
+        _progress(f'Watching package: {name}: {len(files)} files -> MCU... (ctrl-C to stop)\n\n')
+        try:
+            with self.device.session():
+                while True:
+                    files_changed = changed()
+                    if not files_changed:
+                        time.sleep(interval)
+                        continue
+                    while True:  # debounce bursts of edits
+                        time.sleep(debounce)
+                        files_changed_more = [file for file in changed() if file not in files_changed]
+                        if not files_changed_more:
+                            break
+                        files_changed += files_changed_more
+                    for source, destination in files_changed:
+                        mtimes[source] = self._mtime(source)
+                        try:
+                            self._put(name, source, destination, _progress=_progress)
+                        except Exception as e:  # Note: keep watching, eg. file deleted or syntax error from mpy-cross
+                            _progress(f'ERROR: {e.__class__.__name__}: {e}\n')
+                        _progress('\n')
+                    if run:
+                        for file_to_run in self.config.config['packages'][name].get('run', []):
+                            _progress(f'Run: {file_to_run}...\n---8<---------\n')
+                            try:
+                                self.device.run(self.config.make_relative_to_configfile(file_to_run), timeout=self.config.config['packages'][name].get('timeout'), **self._run_cache(name), _progress=_progress)
+                            except device.ampy_pyboard.PyboardError as e:  # Note: PyboardError does not extend Exception
+                                _progress(f'ERROR: {e}\n')
+                            _progress('--------->8---\n')
+                    if reset:
+                        _progress(f'Reset MCU... ')
+                        self.device.reset(_progress=_progress)
+                        _progress(f'done.\n')
+                    _progress(f'Watching package: {name}...\n\n')
+        except KeyboardInterrupt:
+            _progress(f'Stopped watching package: {name}.\n')
+
+    def pack(self, name, mpy=False, _measure=False):
+        """
+        Return filename of a single python file bundling package modules (with `mpy`, compiled with mpy-cross).
+
+        Importing the bundle on MCU mounts its modules (from RAM) on `/_pack`, so they are imported as usual.
+        """
+        files = [(source, destination) for source, destination in self._files(name) if destination.endswith('.py')]
+        sources = {}
+        for source, destination in files:
+            source, destination = self._build(name, source, destination, mpy=mpy)
+            with open(source, 'rb') as f:
+                sources['/' + destination.strip('/')] = f.read()
+        bundle = f'_SOURCES = {sources!r}\n_MODULES = {self._pack_modules(name)!r}\n' + _PACK
+        if _measure:
+            bundle += _PACK_MEASURE
+        filename = os.path.join(self.builddir, 'pack', f'{name}.py')
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as f:
+            f.write(bundle)
+        return filename
+
+    def image(self, name, output=None, format=None, size=None, block_size=None, _progress=lambda state: None):
+        """
+        Build a filesystem image of package files (minified and compiled with mpy-cross, as configured),
+        verify it by reading files back, and return image information.
+
+        Options default to package config `image` (eg. `{format: littlefs, size: 0x200000, block_size: 4096}`),
+        for formats: littlefs (v2) and fat.
+        """
+        options = self.config.config['packages'][name].get('image', {})
+        format = format or options.get('format', 'littlefs')
+        size = size or options.get('size', 0)
+        size = int(size, 0) if type(size) is str else int(size)
+        if not size:
+            raise ValueError(f'Image size is required: use --size or package config: {name}.image.size')
+        output = output or os.path.join(self.builddir, 'image', f'{name}-{format}.img')
+        files = {}
+        for source, destination in self._files(name):
+            source, destination = self._build(name, source, destination)
+            with open(source, 'rb') as f:
+                files[destination] = f.read()
+        _progress(f'Building image: {output}: {format}, {size} bytes, {len(files)} files...\n')
+        information = image_module.build(output, files, size, format=format, block_size=block_size or options.get('block_size'))
+        _progress(f'Verified image: {output}.\n')
+        return information
+
+    def freeze(self, name, output=None, _progress=lambda state: None):
+        """
+        Write MicroPython `manifest.py` and modules tree for freezing package modules in firmware, and return modules
+        frozen and files remaining on filesystem (main.py, boot.py, scripts and other files).
+
+        Options from package config `freeze` (eg. `{include: $(PORT_DIR)/boards/manifest.py, opt: 3}`).
+        """
+        options = self.config.config['packages'][name].get('freeze', {})
+        options = options if type(options) is dict else {}
+        output = output or os.path.join(self.builddir, 'freeze', name)
+        shutil.rmtree(os.path.join(output, 'modules'), ignore_errors=True)  # Note: modules removed from package are not frozen
+        os.makedirs(output, exist_ok=True)
+        modules = set(self._pack_modules(name))
+        frozen, filesystem = {}, []
+        for source, destination in self._files(name):
+            names = source_module._module_names(destination)
+            if names and names[-1] in modules:
+                source, bytes_saved = self._minify(name, source)
+                path = os.path.join(output, 'modules', destination.strip('/'))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.copyfile(source, path)
+                frozen[names[-1]] = destination.strip('/')  # Note: module in `/lib` is frozen without `lib/`
+            else:
+                filesystem.append(destination.strip('/'))
+        manifest = [f'# Generated by microdeploy from package: {name} ({self.config.config_filename})']
+        if options.get('include', '$(PORT_DIR)/boards/manifest.py'):
+            manifest.append(f"include({options.get('include', '$(PORT_DIR)/boards/manifest.py')!r})")
+        for module, destination in sorted(frozen.items()):
+            path = destination[:-len('.py')].split('/')
+            base_path = path[:len(path) - len(module.split('.')) - (path[-1] == '__init__')]
+            script = '/'.join(path[len(base_path):]) + '.py'
+            freeze_args = [repr('/'.join(['modules'] + base_path)), repr(script)]  # Note: path is relative to manifest.py
+            if 'opt' in options:
+                freeze_args.append(f"opt={int(options['opt'])}")
+            manifest.append(f"freeze({', '.join(freeze_args)})")
+        with open(os.path.join(output, 'manifest.py'), 'w') as f:
+            f.write('\n'.join(manifest) + '\n')
+        _progress(f"Manifest: {os.path.join(output, 'manifest.py')} - build firmware with: make FROZEN_MANIFEST={os.path.abspath(os.path.join(output, 'manifest.py'))}\n\n")
+        for module, destination in sorted(frozen.items()):
+            _progress(f'frozen      {destination}  ({module})\n')
+        for destination in filesystem:
+            _progress(f'filesystem  {destination}\n')
+        return {'manifest': os.path.join(output, 'manifest.py'), 'frozen': sorted(frozen), 'filesystem': filesystem}
+
+    def run(self, name, mpy=False, compare=False, _progress=lambda state: None):
+        """
+        Run package on MCU from a single bundle (without storing on filesystem), then run package `run` scripts.
+        The import time and heap usage of package modules is measured (with `compare`, also from files on MCU, as pushed).
+        """
+        bundle = self.pack(name, mpy=mpy, _measure=True)
+        with open(bundle) as f:
+            script = f.read()
+        for file_to_run in self.config.config['packages'][name].get('run', []):
+            with open(self.config.make_relative_to_configfile(file_to_run)) as f:
+                script += f'\n# {file_to_run}\n' + f.read()
+        script_filename = os.path.join(self.builddir, 'pack', f'{name}-run.py')
+        with open(script_filename, 'w') as f:
+            f.write(script)
+        _progress(f'Run: package: {name} ({os.stat(bundle).st_size} bytes bundle)...\n---8<---------\n')
+        self.device.run(script_filename, timeout=self.config.config['packages'][name].get('timeout'), _progress=_progress)
+        _progress('--------->8---\n')
+        if compare:
+            script_filename = os.path.join(self.builddir, 'pack', f'{name}-files.py')
+            with open(script_filename, 'w') as f:
+                f.write(f'_MODULES = {self._pack_modules(name)!r}\n_SOURCES = None\n' + _PACK_UNMOUNT + _PACK_MEASURE)  # Note: bundle is still mounted without soft reset
+            _progress(f'Run: package: {name} (from files on MCU)...\n---8<---------\n')
+            self.device.run(script_filename, _progress=_progress)
+            _progress('--------->8---\n')
+
+    def profile(self, name, output=None, _progress=lambda state: None):
+        """
+        Import package modules on MCU (as pushed, except main and boot) in dependency order, and return import time and heap usage
+        per module, sorted by import time (with `output`, also write report as json to file `output`).
+        The script is interrupted after package config `timeout` seconds, if any.
+        Note: cost of a module includes modules it imports that were not yet imported.
+        """
+        modules = source_module.order(self._files(name), cachedir=os.path.join(self.builddir, 'imports'))
+        modules = [module for module in modules if module not in ('main', 'boot')]  # Note: importing entry scripts would run the application
+        script_filename = os.path.join(self.builddir, 'profile', f'{name}.py')
+        os.makedirs(os.path.dirname(script_filename), exist_ok=True)
+        with open(script_filename, 'w') as f:
+            f.write(f'_MODULES = {modules!r}\n' + _PROFILE)
+        _progress(f'Profiling package: {name}: importing {len(modules)} modules on MCU...\n')
+        result = self.device.run(script_filename, timeout=self.config.config['packages'][name].get('timeout'))
+        report = [dict(zip(('module', 'time_us', 'allocated', 'retained', 'mem_free', 'error'), row)) for row in ast.literal_eval(result.strip().splitlines()[-1])]
+        report.sort(key=lambda row: row['time_us'], reverse=True)
+        for row in report:
+            _progress(f"{row['time_us']:>10} us {row['allocated']:>8} bytes allocated {row['retained']:>8} bytes retained {row['mem_free']:>8} bytes free  {row['module']}{'  ERROR: ' + row['error'] if row['error'] else ''}\n")
+        _progress(f"{sum(row['time_us'] for row in report):>10} us {sum(row['allocated'] for row in report):>8} bytes allocated {sum(row['retained'] for row in report):>8} bytes retained  (total)\n")
+        if output:
+            with open(output, 'w') as f:
+                f.write(json.dumps(report, indent=2))
+        return report
+
+    def _files(self, name):
+        """Return files of package `name`, caching imports parsed for `shake` in `builddir` (unlike read-only `files()`)."""
+        return self.config.package_files(name, cachedir=os.path.join(self.builddir, 'imports'))
+
+    def _pack_modules(self, name):
+        """Return names of importable modules in package `name`, as imported on MCU (excluding main and boot, and scripts like `tests-run.py`)."""
+        names = [source_module._module_names(destination)[-1:] for source, destination in self._files(name)]  # Note: modules in /lib are imported without `lib.`
+        return [names[0] for names in names if names and names[0] not in ('main', 'boot') and all(part.isidentifier() for part in names[0].split('.'))]
+
+    def _put(self, name, source, destination, force=False, _progress=lambda state: None):
+        """Upload file `source` of package `name` to MCU, minifying and compiling to .mpy if applicable (see `_build()`), and return bytes uploaded."""
+        source_minified, bytes_saved = self._minify(name, source)
+        if source_minified != source:
+            _progress(f'Minified: {source} ... {bytes_saved} bytes saved\n')
+            self.minified_bytes_saved += bytes_saved
+        source_built, destination = self._build(name, source, destination)
+        if source_built != source_minified:
+            _progress(f'Compiled: {source}\n  -> {source_built} ... with mpy-cross\n')
+        return self.device.put(source_built, destination, parents_create=True, force=force, _progress=_progress)
+
+    def _check_space(self, name, files, force=False, nofail=False, _progress=lambda state: None):
+        """Raise if space on MCU filesystem is not enough for uploading `files` of package `name` (warn if `nofail`)."""
+        upload = {}
+        for source, destination in files:
+            source, destination = self._build(name, source, destination)  # Note: as uploaded, eg. .mpy
+            with open(source, 'rb') as f:
+                data = f.read()
+            if force or not self.device.same(destination, data):
+                upload['/' + destination.strip('/')] = len(data)
+        if not upload:
+            return
+        space = self.device.space(upload.keys())
+        blocks = lambda size: -(-(size or 0) // space['block_size']) * space['block_size']
+        needed = sum(blocks(size) - blocks(space['sizes'][filename]) for filename, size in upload.items())
+        needed += max(blocks(size) for size in upload.values())  # Note: temporary file for atomic upload
+        _progress(f"Space on MCU: {space['free']} bytes free, {needed} bytes needed for {len(upload)} files.\n\n")
+        if needed > space['free']:
+            message = f"Not enough space on MCU for package: {name}: {needed} bytes needed, {space['free']} bytes free"
+            if not nofail:
+                raise RuntimeError(f'{message} - use --nofail to push anyway')
+            _progress(f'WARNING: {message} !\n\n')
+
+    def _run_cache(self, name):
+        """Return arguments `cache` and `mpy` of `Device.run()` for `run` scripts of package `name` (package config `run_cache`: `true` or `mpy`)."""
+        run_cache = self.config.config['packages'][name].get('run_cache', False)
+        return {'cache': bool(run_cache), 'mpy': run_cache == 'mpy'}
+
+    def _build(self, name, source, destination, mpy=None):
+        """
+        Return `(source, destination)` for file of package `name` as uploaded (minified, and compiled with mpy-cross if `mpy` or package config `mpy`),
+        built in `builddir` - Note: unlike `_put()`, the .mpy file is kept.
+        """
+        source, bytes_saved = self._minify(name, source)
+        mpycross_args = self.config.config['packages'][name].get('mpy', False) if mpy is None else mpy
+        if not mpycross_args or not source.endswith('.py') or _unstaged(destination) in ('main.py', 'boot.py'):
+            return source, destination
+        try:
+            import mpy_cross
+        except ImportError as e:
+            raise e.__class__(f'Please install mpy-cross: `pip install mpy-cross` - {e}')
+        mpycross_args = mpycross_args if type(mpycross_args) in [list, tuple] else []
+        destination = re.sub(r'\.py$', '.mpy', destination)
+        source_mpy = os.path.join(self.builddir, 'mpy', name, destination.strip('/'))
+        os.makedirs(os.path.dirname(source_mpy), exist_ok=True)
+        if mpy_cross.run(source, '-o', source_mpy, '-s', _unstaged(destination), *mpycross_args).wait():  # Note: same .mpy for all slots
+            raise RuntimeError(f'Compilation failed with mpy-cross: {source}')
+        return source_mpy, destination
+
+    def _minify(self, name, source):
+        """Return filename of minified `source` (cached by content hash) and bytes saved, if package `name` has `minify`."""
+        options = self.config.config['packages'][name].get('minify', False)
+        if not options or not source.endswith('.py'):
+            return source, 0
+        lines = type(options) is dict and options.get('lines', False)
+        with open(source, 'rb') as f:
+            data = f.read()
+        key = hashlib.sha256(data + (b' lines' if lines else b'')).hexdigest()
+        source_minified = os.path.join(self.builddir, 'minify', key, os.path.basename(source))
+        if not os.path.exists(source_minified):
+            os.makedirs(os.path.dirname(source_minified), exist_ok=True)
+            with open(f'{source_minified}.tmp', 'w', encoding='utf-8') as f:
+                f.write(source_module.minify(data.decode('utf-8'), lines=lines))
+            os.replace(f'{source_minified}.tmp', source_minified)
+        return source_minified, len(data) - os.stat(source_minified).st_size
+
+    def _slots(self):
+        """Return tuple of active slot (or `None`) and inactive slot names on MCU."""
+        try:
+            slot_active = self.device.get('/.slot').decode().strip() or None
+        except RuntimeError as e:
+            if 'No such file' not in str(e): raise
+            slot_active = None
+        return slot_active, 'slot_b' if slot_active == 'slot_a' else 'slot_a'
+
+    def _copy_from_slot(self, name, source, destination, slot, slot_active, _progress=lambda state: None):
+        """Copy file `source` of package `name` on MCU from active slot to `destination` if unchanged (as built, see `_build()`), and return `True` if copied."""
+        if not slot_active:
+            return False
+        source, destination = self._build(name, source, destination)
+        with open(source, 'rb') as f:
+            data = f.read()
+        destination_active = f'/{slot_active}/{_unstaged(destination)}'
+        if self.device.same(destination, data) or not self.device.same(destination_active, data):
+            return False  # Note: already staged, or changed (must be uploaded)
+        _progress(f'Copy: {destination_active}\n  -> {destination} ... on MCU\n')
+        self.device.copy(destination_active, destination)
+        return True
+
+    def _switch_slot(self, slot, _progress=lambda state: None):
+        """
+        Make `slot` active on MCU, installing `_STAGED_BOOT` as `boot.py` if needed
+        (an existing `boot.py` is backed up as `boot.py.bak`, it is to be deployed in package instead).
+        """
+        self.device.manifest.invalidate()  # Note: in push session
+        backup = self.device.exec(f"""if 1:  # hack indent error
+            try:
+                import os
+            except ImportError:
+                import uos as os
+            boot = {_STAGED_BOOT!r}
+            try:
+                with open('/boot.py') as f:
+                    installed = f.read() == boot
+                exists = True
+            except OSError:
+                installed = exists = False
+            if exists and not installed:
+                os.rename('/boot.py', '/boot.py.bak')
+                print('backup')
+            if not installed:
+                with open('/boot.py', 'w') as f:
+                    f.write(boot)
+            with open('/.slot.tmp', 'w') as f:
+                f.write({slot!r})
+            os.rename('/.slot.tmp', '/.slot')  # Note: atomic switch
+        """).strip() == 'backup'
+        if backup:
+            self.device.hashcache.copy('/boot.py', '/boot.py.bak')
+            self.device.manifest.copy('/boot.py', '/boot.py.bak')
+            _progress(f'\nWARNING: Existing /boot.py on MCU backed up as /boot.py.bak, replaced with boot.py running boot.py of active slot !\n')
+        self.device.hashcache.remove('/boot.py')
+        self.device.manifest.remove('/boot.py')
+
+    @contextlib.contextmanager
+    def _record(self, name):
+        """Record push of package `name` in history, counting an uncaught exception as error - see `Microdeploy.history()`."""
+        record = {'files': 0, 'files_total': 0, 'bytes': 0, 'errors': 0}
+        time_start = time.time()
+        try:
+            yield record
+        except BaseException:
+            record['errors'] += 1
+            raise
+        finally:
+            self.device.hashcache.add_push(name, time_start, **record)
+
+    def _mtime(self, filename):
+        """Return modification time of `filename`, or `None` if file does not exist."""
+        try:
+            return os.stat(filename).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
     # def stats(self, name):
     #     # TODO: for file in package: display count lines/bytes/words/spaces/emptylines + total for package
     #     pass
 
-    # def pack(self, name):
-    #     # TODO: create a single file with all files of a package (respecting imports)
-    #     pass
 
-    # def run(self, name):
-    #     # TODO: ampy run <a packed package> (may be too slow to upload for a single run ?)
-    #     pass
+
+# Helpers
+
+import json
+
+def _unstaged(destination):
+    """Return `destination` relative to slot (eg. `slot_a/main.py` -> `main.py`), for files of staged push - see `_STAGED_BOOT`."""
+    return re.sub(r'^/?slot_[ab]/', '', destination).strip('/')
+
+_STAGED_BOOT = """\
+# Installed by microdeploy for staged deployment: run boot.py and main.py from active slot (see file /.slot).
+import sys
+import os
+try:
+    with open('/.slot') as f:
+        slot = '/' + f.read().strip()
+except OSError:
+    slot = None
+if slot:
+    sys.path[:0] = [slot, slot + '/lib']
+    os.chdir(slot)  # Note: main.py is then run from active slot
+    try:
+        exec(open('boot.py').read())
+    except OSError:
+        pass
+"""
+
+_PACK = """\
+# Generated by microdeploy: package modules bundled in a single file - see `Package.pack()`.
+import sys
+import io
+try:
+    import os
+except ImportError:
+    import uos as os
+
+
+class _PackFS:
+    \"\"\"Read-only filesystem (VFS) of modules in `_SOURCES`.\"\"\"
+
+    def _path(self, path):
+        return '/' + path.strip('/')
+
+    def mount(self, readonly, mkfs):
+        pass
+
+    def umount(self):
+        pass
+
+    def chdir(self, path):
+        pass
+
+    def getcwd(self):
+        return '/'
+
+    def ilistdir(self, path):
+        path = self._path(path).rstrip('/') + '/'
+        names = set(filename[len(path):].split('/')[0] for filename in _SOURCES if filename.startswith(path))
+        for name in names:
+            yield (name, 0x8000 if path + name in _SOURCES else 0x4000, 0)
+
+    def stat(self, path):
+        path = self._path(path)
+        if path in _SOURCES:
+            return (0x8000, 0, 0, 0, 0, 0, len(_SOURCES[path]), 0, 0, 0)
+        if path == '/' or any(filename.startswith(path + '/') for filename in _SOURCES):
+            return (0x4000, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+        raise OSError(2)  # ENOENT
+
+    def open(self, path, mode):
+        try:
+            return io.BytesIO(_SOURCES[self._path(path)])
+        except KeyError:
+            raise OSError(2)  # ENOENT
+
+    def statvfs(self, path):
+        return (0,) * 10
+
+
+try:
+    os.umount('/_pack')
+except OSError:
+    pass
+os.mount(_PackFS(), '/_pack')
+for _path in ('/_pack/lib', '/_pack'):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+"""
+
+_PACK_UNMOUNT = """
+# Generated by microdeploy: unmount bundle mounted by `_PACK`, so that modules are imported from files.
+import sys
+try:
+    import os
+except ImportError:
+    import uos as os
+try:
+    os.umount('/_pack')
+except OSError:
+    pass
+for _path in ('/_pack/lib', '/_pack'):
+    while _path in sys.path:
+        sys.path.remove(_path)
+"""
+
+_PACK_MEASURE = """
+# Generated by microdeploy: measure import time and heap usage of package modules.
+import sys
+import gc
+import time
+for _module in _MODULES:
+    sys.modules.pop(_module, None)
+gc.collect()
+_mem_free, _mem_alloc = gc.mem_free(), gc.mem_alloc()
+_time = time.ticks_us()
+for _module in _MODULES:
+    __import__(_module)
+_time = time.ticks_diff(time.ticks_us(), _time)
+gc.collect()
+print('microdeploy: imported %d modules from %s in %d us, heap: free %d -> %d bytes, allocated %d -> %d bytes' % (
+    len(_MODULES), 'files' if _SOURCES is None else 'bundle', _time, _mem_free, gc.mem_free(), _mem_alloc, gc.mem_alloc()))
+"""
+
+_PROFILE = """
+# Generated by microdeploy: profile import time and heap usage of package modules - see `Package.profile()`.
+import sys
+import gc
+import time
+for _module in _MODULES:
+    sys.modules.pop(_module, None)
+_report = []
+for _module in _MODULES:
+    _error = None
+    gc.collect()
+    _mem_alloc = gc.mem_alloc()
+    _time = time.ticks_us()
+    try:
+        __import__(_module)
+    except Exception as e:
+        _error = repr(e)
+    _time = time.ticks_diff(time.ticks_us(), _time)
+    _allocated = gc.mem_alloc() - _mem_alloc
+    gc.collect()
+    _report.append((_module, _time, _allocated, gc.mem_alloc() - _mem_alloc, gc.mem_free(), _error))
+print(_report)
+"""
+
+
+class _Journal(object):
+    """
+    Journal of files pushed to MCU, for resuming an interrupted push - see `Package.push(resume)`.
+    """
+
+    def __init__(self, journalfile='.microdeploy.journal'):
+        self.journalfile = journalfile
+
+    def read(self, name, device_id):
+        """Return journal `dict` for package `name` pushed to device `device_id` (having keys `files` and `done`), or `None`."""
+        try:
+            with open(self.journalfile) as f:
+                journal = json.loads(f.read())
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return None
+        return journal if journal.get('package') == name and journal.get('device') == device_id else None
+
+    def write(self, name, device_id, files, done):
+        """Write journal for package `name` pushed to device `device_id`, replacing existing content."""
+        try:
+            with open(self.journalfile, 'w') as f:
+                f.write(json.dumps({'package': name, 'device': device_id, 'files': files, 'done': done}))
+        except PermissionError as e:
+            pass  # Note: resume is not possible, push works anyway
+
+    def clear(self):
+        """Remove journal file."""
+        try:
+            os.unlink(self.journalfile)
+        except FileNotFoundError:
+            pass
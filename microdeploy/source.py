@@ -0,0 +1,183 @@
+"""
+Microdeploy Source transformer.
+"""
+
+import tokenize
+import hashlib
+import json
+import ast
+import io
+import os
+
+
+def minify(source: str, lines: bool = False) -> str:
+    """
+    Return python `source` without comments, docstrings, blank lines and redundant whitespace.
+    With `lines`, line numbers are preserved (for tracebacks), keeping empty lines.
+    """
+    tokens = list(tokenize.generate_tokens(io.StringIO(source).readline))
+    rows = source.splitlines(keepends=False)
+    edits = []  # (start, end, replacement), as (row, col) positions
+
+    for token in tokens:
+        if token.type == tokenize.COMMENT:
+            edits.append((token.start, token.end, ''))
+
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) and node.body:
+            docstring = node.body[0]
+            if isinstance(docstring, ast.Expr) and isinstance(docstring.value, ast.Constant) and isinstance(docstring.value.value, str):
+                col = len(rows[docstring.lineno - 1].encode()[:docstring.col_offset].decode())  # Note: ast offsets are in utf-8 bytes
+                end_col = len(rows[docstring.end_lineno - 1].encode()[:docstring.end_col_offset].decode())
+                after = rows[docstring.end_lineno - 1][end_col:].strip()
+                inline = rows[docstring.lineno - 1][:col].strip() or (after and not after.startswith('#'))
+                replacement = 'pass' if len(node.body) == 1 or inline else ''
+                edits.append(((docstring.lineno, col), (docstring.end_lineno, end_col), replacement))
+
+    for (row, col), (end_row, end_col), replacement in sorted(edits, reverse=True):
+        newlines = '\n' * (end_row - row)  # Note: keep rows, to use tokens positions afterwards
+        text = '\n'.join(rows[row-1:end_row])
+        end = len(text) - len(rows[end_row-1]) + end_col
+        rows[row-1:end_row] = (text[:col] + replacement + newlines + text[end:]).split('\n')
+
+    # Rows beginning or ending inside a multiline token (eg. string) must be left as is
+    rows_begin_in_token, rows_end_in_token = set(), set()
+    for token in tokens:
+        if token.start[0] != token.end[0] and token.type not in (tokenize.NEWLINE, tokenize.NL):
+            rows_begin_in_token.update(range(token.start[0] + 1, token.end[0] + 1))
+            rows_end_in_token.update(range(token.start[0], token.end[0]))
+
+    # Rows beginning a logical line, with indentation depth
+    rows_depth = {}
+    depth = 0
+    line_start = True
+    for token in tokens:
+        if token.type == tokenize.INDENT:
+            depth += 1
+        elif token.type == tokenize.DEDENT:
+            depth -= 1
+        elif token.type == tokenize.NEWLINE:
+            line_start = True
+        elif token.type not in (tokenize.NL, tokenize.COMMENT, tokenize.ENDMARKER) and line_start:
+            rows_depth[token.start[0]] = depth
+            line_start = False
+
+    minified = []
+    for number, row in enumerate(rows, start=1):
+        if number not in rows_begin_in_token:
+            row = ' ' * rows_depth.get(number, 0) + row.lstrip()
+        if number not in rows_end_in_token:
+            row = row.rstrip()
+        if row or lines or number in rows_begin_in_token:
+            minified.append(row)
+    return '\n'.join(minified) + '\n' if minified else ''
+
+
+def imports(source: str, cachedir: str = None) -> list:
+    """
+    Return imports statements in python file `source`, as list of `[level, module, names]`
+    (cached in `cachedir` by content hash).
+    """
+    with open(source, 'rb') as f:
+        data = f.read()
+    cachefile = cachedir and os.path.join(cachedir, f'{hashlib.sha256(data).hexdigest()}.json')
+    try:
+        with open(cachefile) as f:
+            return json.loads(f.read())
+    except (TypeError, FileNotFoundError, json.decoder.JSONDecodeError):
+        pass
+    statements = []
+    for node in ast.walk(ast.parse(data, source)):  # Note: including imports in functions and try blocks
+        if isinstance(node, ast.Import):
+            statements += [[0, alias.name, []] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            statements.append([node.level, node.module or '', [alias.name for alias in node.names]])
+        elif isinstance(node, ast.Call) and getattr(node.func, 'id', getattr(node.func, 'attr', None)) in ('__import__', 'import_module') \
+                and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+            statements.append([0, node.args[0].value, []])
+    if cachefile:
+        os.makedirs(cachedir, exist_ok=True)
+        with open(cachefile, 'w') as f:
+            f.write(json.dumps(statements))
+    return statements
+
+
+def shake(files: list, entries: list, cachedir: str = None) -> list:
+    """
+    Return `files` (list of `(source, destination)`) without python modules not reachable by imports
+    from `entries` (list of sources), keeping files that are not python modules.
+    """
+    modules = _modules(files)
+    entries_files = [file for file in files if file[0] in entries]
+    queue = [(file, _module_names(file[1])[0] if _module_names(file[1]) else '', file[1].endswith('__init__.py')) for file in entries_files]
+    queue += [((entry, None), '__main__', False) for entry in entries if entry not in [file[0] for file in entries_files]]
+    reachable = set(entries_files)
+    while queue:
+        file, name, is_package = queue.pop()
+        for candidate, file_imported in _imported(file[0], name, is_package, modules, cachedir):
+            if file_imported not in reachable:
+                reachable.add(file_imported)
+                queue.append((file_imported, candidate, file_imported[1].endswith('__init__.py')))
+    return [file for file in files if file in reachable or not file[1].endswith('.py')]
+
+
+def order(files: list, cachedir: str = None) -> list:
+    """
+    Return module names of python `files` (list of `(source, destination)`) in dependency order (imported modules first),
+    as imported on MCU (modules in `/lib` without `lib.`).
+    """
+    modules = _modules(files)
+    ordered = []
+    visiting = set()
+    def visit(name):
+        if name in ordered or name in visiting:  # Note: circular imports are ordered as found
+            return
+        visiting.add(name)
+        file = modules[name]
+        for candidate, file_imported in _imported(file[0], name, file[1].endswith('__init__.py'), modules, cachedir):
+            visit(_module_names(file_imported[1])[-1])
+        ordered.append(name)
+    for source, destination in files:
+        names = _module_names(destination)
+        if names and all(part.isidentifier() for part in names[-1].split('.')):
+            visit(names[-1])
+    return ordered
+
+
+def _modules(files):
+    """Return `dict` of module name -> `(source, destination)` for python `files`."""
+    modules = {}
+    for source, destination in files:
+        for name in _module_names(destination):
+            modules[name] = (source, destination)
+    return modules
+
+
+def _imported(source, name, is_package, modules, cachedir=None):
+    """Return list of `(module name, file)` in `modules` imported by python file `source` of module `name`."""
+    imported_files = []
+    for level, module, names in imports(source, cachedir):
+        if level:
+            package = name if is_package else name.rpartition('.')[0]
+            base = package.split('.')[:len(package.split('.')) - (level - 1)] if package else []
+            module = '.'.join(base + ([module] if module else []))
+        for imported in [module] + [f'{module}.{n}' if module else n for n in names]:
+            parts = imported.split('.')
+            for candidate in ['.'.join(parts[:i]) for i in range(1, len(parts) + 1)]:  # Note: parent packages are imported too
+                if candidate in modules and candidate != name:
+                    imported_files.append((candidate, modules[candidate]))
+    return imported_files
+
+
+def _module_names(destination):
+    """Return module names for file `destination` on MCU (also relative to `/lib`, which is in `sys.path`)."""
+    path = destination.strip('/')
+    if not path.endswith('.py'):
+        return []
+    path = path[:-len('.py')]
+    if path.endswith('/__init__') or path == '__init__':
+        path = path[:-len('__init__')].rstrip('/')
+    names = [path.replace('/', '.')] if path else []
+    if path.startswith('lib/'):
+        names.append(path[len('lib/'):].replace('/', '.'))
+    return names
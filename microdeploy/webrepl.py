@@ -0,0 +1,203 @@
+"""
+Microdeploy WebREPL transport.
+
+Connect to MicroPython WebREPL (eg. `ws://192.168.4.1:8266`) with the interface of `serial.Serial` used by `ampy.pyboard.Pyboard`
+(terminal in websocket text frames), and transfer files with the WebREPL binary protocol (much faster than raw REPL).
+See: https://github.com/micropython/webrepl/blob/master/webrepl_cli.py
+"""
+
+import urllib.parse
+import select
+import base64
+import struct
+import socket
+import errno
+import ssl
+import os
+
+_REQUEST = '<2sBBQLH64s'  # signature `WA`, operation, reserved, reserved, size, filename length, filename
+_RESPONSE = '<2sH'  # signature `WB`, status
+_PUT, _GET = 1, 2
+
+
+class WebREPL(object):
+    """WebREPL connection to `url`, logged in with `password`."""
+
+    def __init__(self, url: str, password: str = None, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+        self.text = bytearray()  # terminal data received
+        self.binary = bytearray()  # file transfer data received
+        self.binary_frame = False  # type of last frame, for continuation frames
+        url = urllib.parse.urlparse(url)
+        self.socket = socket.create_connection((url.hostname, url.port or 8266), timeout=timeout)
+        if url.scheme == 'wss':
+            self.socket = ssl.create_default_context().wrap_socket(self.socket, server_hostname=url.hostname)
+        self._handshake(url)
+        self._login(password)
+
+    def inWaiting(self) -> int:
+        """Return number of terminal bytes available (without blocking)."""
+        while self._readable():
+            self._receive()
+        return len(self.text)
+
+    @property
+    def in_waiting(self) -> int:
+        return self.inWaiting()
+
+    def read(self, size: int = 1) -> bytes:
+        """Return `size` terminal bytes (less after `timeout`)."""
+        try:
+            while len(self.text) < size:
+                self._receive()
+        except socket.timeout:
+            pass
+        data = bytes(self.text[:size])
+        del self.text[:size]
+        return data
+
+    def write(self, data: bytes) -> int:
+        """Send terminal bytes."""
+        self._send(0x1, data)
+        return len(data)
+
+    def close(self):
+        try:
+            self._send(0x8, b'')
+        except OSError:
+            pass
+        self.socket.close()
+
+    def put(self, filename: str, data: bytes, progress_cb=lambda bytes_sent: None, chunk_size=1024):
+        """Write `data` to file `filename` on MCU."""
+        request = self._request(_PUT, filename, len(data))
+        self._send(0x2, request[:10])  # Note: header in 2 frames, as `webrepl_cli.py`
+        self._send(0x2, request[10:])
+        self._response(filename)
+        for i in range(0, len(data), chunk_size):
+            self._send(0x2, data[i:i+chunk_size])
+            progress_cb(len(data[i:i+chunk_size]))
+        self._response(filename)
+
+    def get(self, filename: str) -> bytes:
+        """Return content of file `filename` on MCU."""
+        self._send(0x2, self._request(_GET, filename, 0))
+        self._response(filename)
+        data = bytearray()
+        while True:
+            self._send(0x2, b'\0')  # Note: request next chunk
+            size, = struct.unpack('<H', self._read_binary(2))
+            if not size:
+                break
+            data += self._read_binary(size)
+        self._response(filename)
+        return bytes(data)
+
+    def _request(self, operation, filename, size):
+        filename = filename.encode('utf-8')
+        if len(filename) > 64:
+            raise ValueError(f'Filename too long for WebREPL (64 bytes max): {filename}')
+        return struct.pack(_REQUEST, b'WA', operation, 0, 0, size, len(filename), filename)
+
+    def _response(self, filename):
+        """Raise `OSError` if WebREPL response has an error status."""
+        signature, status = struct.unpack(_RESPONSE, self._read_binary(4))
+        if signature != b'WB':
+            raise ConnectionError(f'Unexpected WebREPL response: {signature}')
+        if status:
+            raise OSError(status, f'WebREPL file transfer failed: {errno.errorcode.get(status, status)}', filename)
+
+    def _read_binary(self, size):
+        while len(self.binary) < size:
+            self._receive()
+        data = bytes(self.binary[:size])
+        del self.binary[:size]
+        return data
+
+    def _handshake(self, url):
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.socket.sendall((
+            f'GET {url.path or "/"} HTTP/1.1\r\nHost: {url.netloc}\r\nConnection: Upgrade\r\nUpgrade: websocket\r\n'
+            f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n').encode())
+        response = b''
+        while b'\r\n\r\n' not in response:
+            data = self.socket.recv(1)
+            if not data:
+                raise ConnectionError(f'WebREPL handshake failed: {self.url}')
+            response += data
+        if b' 101 ' not in response.split(b'\r\n')[0]:
+            raise ConnectionError(f'WebREPL handshake failed: {self.url}: {response.splitlines()[0].decode()}')
+
+    def _login(self, password):
+        self._read_until(b'Password: ')
+        self.write((password or '').encode() + b'\r')
+        if b'WebREPL connected' not in self._read_until(b'\r\n', b'\r\n'):  # Note: prompt `>>> ` is left
+            raise PermissionError(f'WebREPL access denied: {self.url} (see config `device.password`)')
+
+    def _read_until(self, *markers):
+        for marker in markers:
+            while marker not in self.text:
+                self._receive()
+            index = self.text.index(marker) + len(marker)
+            data = bytes(self.text[:index])
+            del self.text[:index]
+        return data
+
+    def _readable(self):
+        if isinstance(self.socket, ssl.SSLSocket) and self.socket.pending():
+            return True
+        return bool(select.select([self.socket], [], [], 0)[0])
+
+    def _receive(self):
+        """Receive one websocket frame, into terminal or file transfer data."""
+        header = self._recv(2)
+        opcode, length = header[0] & 0x0f, header[1] & 0x7f
+        if length == 126:
+            length, = struct.unpack('>H', self._recv(2))
+        elif length == 127:
+            length, = struct.unpack('>Q', self._recv(8))
+        mask = self._recv(4) if header[1] & 0x80 else None
+        payload = self._recv(length)
+        if mask:
+            payload = _mask(payload, mask)
+        if opcode == 0x8:
+            raise ConnectionResetError(f'WebREPL connection closed: {self.url}')
+        elif opcode == 0x9:
+            self._send(0xa, payload)
+        elif opcode == 0x2 or (opcode == 0x0 and self.binary_frame):
+            self.binary += payload
+        elif opcode in (0x0, 0x1):
+            self.text += payload
+        if opcode in (0x1, 0x2):
+            self.binary_frame = opcode == 0x2
+
+    def _recv(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionResetError(f'WebREPL connection closed: {self.url}')
+            data += chunk
+        return data
+
+    def _send(self, opcode, payload):
+        """Send websocket frame (masked, as a client)."""
+        length = len(payload)
+        header = bytes([0x80 | opcode])
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 2**16:
+            header += bytes([0x80 | 126]) + struct.pack('>H', length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack('>Q', length)
+        mask = os.urandom(4)
+        self.socket.sendall(header + mask + _mask(payload, mask))
+
+
+# Helpers
+
+def _mask(payload, mask):
+    """Return websocket `payload` xor-ed with 4 bytes `mask` (computed at once as integers)."""
+    mask = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(mask, 'big')).to_bytes(len(payload), 'big')
@@ -35,4 +35,7 @@ setup(
         'PyYAML',
         'fire'
     ],
+    extras_require={
+        'image': ['littlefs-python', 'pyfatfs'],
+    },
     entry_points = {'console_scripts': ['microdeploy=microdeploy.cli:run']})
@@ -0,0 +1,402 @@
+"""
+Test fixtures.
+
+`mcu` simulates a MicroPython board on a serial port: raw REPL protocol, filesystem in a temporary directory,
+commands executed with CPython (with `os`, `sys`, `machine`, `time`, `gc` and `deflate` of MicroPython).
+"""
+
+from microdeploy import config as config_module
+from microdeploy import device as device_module
+import threading
+import builtins
+import binascii
+import hashlib
+import serial
+import pytest
+import types
+import errno
+import time
+import zlib
+import sys
+import os
+
+
+class Hang(Exception):
+    """Raised when a read on the simulated port would block forever."""
+
+
+class _Reset(BaseException):
+    """Raised by `machine.reset()` on simulated MCU."""
+
+
+class FakeMCU(object):
+    """Simulated MicroPython board, with the interface of `serial.Serial`."""
+
+    read_timeout = 3  # seconds before a blocking read is considered a hang
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.output = bytearray()
+        self.condition = threading.Condition()
+        self.mode = 'friendly'
+        self.buffer = bytearray()
+        self.interrupt = threading.Event()
+        self.thread = None
+        self.soft_reboots = 0
+        self.resets = 0
+        self.commands = []  # code executed in raw REPL
+        self.free_blocks = 256
+        self.os = _FakeOS(self)
+        self._boot()
+
+    # Serial interface
+
+    def write(self, data):
+        for byte in bytes(data):
+            self._input(bytes([byte]))
+        return len(data)
+
+    def inWaiting(self):
+        with self.condition:
+            return len(self.output)
+
+    @property
+    def in_waiting(self):
+        return self.inWaiting()
+
+    def read(self, size=1):
+        deadline = time.time() + self.read_timeout
+        with self.condition:
+            while len(self.output) < size:
+                if time.time() > deadline:
+                    raise Hang('Hang: serial.read() would block forever')
+                self.condition.wait(0.01)
+            data = bytes(self.output[:size])
+            del self.output[:size]
+        return data
+
+    def close(self):
+        pass
+
+    # Simulation
+
+    def path(self, path):
+        """Return path on host of `path` on MCU."""
+        path = path if path.startswith('/') else self.os.cwd.rstrip('/') + '/' + path
+        return os.path.join(self.root, *[part for part in path.split('/') if part])
+
+    def send(self, data):
+        with self.condition:
+            self.output += data
+            self.condition.notify_all()
+
+    def wait(self):
+        """Wait until code running on MCU is done."""
+        if self.thread:
+            self.thread.join()
+
+    def _boot(self):
+        self.globals = {'__name__': '__main__', '__builtins__': self._builtins()}
+        self.sys_path = ['', '/lib']
+        self.modules = {}
+        if os.path.exists(self.path('/boot.py')):
+            self._execute(open(self.path('/boot.py'), 'rb').read(), follow=False)
+
+    def _input(self, c):
+        if self.thread and self.thread.is_alive():
+            if c == b'\x03':
+                self.interrupt.set()
+            return
+        if self.mode == 'friendly':
+            if c == b'\x01':
+                self.mode = 'raw'
+                self.buffer.clear()
+                self.send(b'raw REPL; CTRL-B to exit\r\n>')
+            elif c == b'\x04':
+                self.soft_reboots += 1
+                self._boot()
+                self.send(b'MPY: soft reboot\r\n>>> ')
+            return
+        if self.buffer == b'\x05A' and c == b'\x01':  # Note: raw-paste mode is not supported
+            self.buffer.clear()
+            self.send(b'R\x00')
+        elif c == b'\x01':
+            self.buffer.clear()
+            self.send(b'raw REPL; CTRL-B to exit\r\n>')
+        elif c == b'\x02':
+            self.mode = 'friendly'
+            self.send(b'\r\n>>> ')
+        elif c == b'\x03':
+            self.buffer.clear()
+        elif c == b'\x04' and not self.buffer:
+            self.soft_reboots += 1
+            self.send(b'OK\r\nMPY: soft reboot\r\n')
+            self._boot()
+            self.send(b'raw REPL; CTRL-B to exit\r\n>')
+        elif c == b'\x04':
+            code = bytes(self.buffer)
+            self.buffer.clear()
+            self.send(b'OK')
+            self.commands.append(code.decode())
+            self.interrupt.clear()
+            self.thread = threading.Thread(target=self._execute, args=(code,), daemon=True)
+            self.thread.start()
+        else:
+            self.buffer += c
+
+    def _execute(self, code, follow=True):
+        def trace(frame, event, arg):
+            if self.interrupt.is_set():
+                self.interrupt.clear()
+                raise KeyboardInterrupt()
+            return trace
+        error = b''
+        sys.settrace(trace)
+        try:
+            exec(compile(code, '<stdin>', 'exec'), self.globals)
+        except _Reset:
+            sys.settrace(None)
+            self.resets += 1
+            self.mode = 'friendly'
+            self._boot()
+            self.send(b'\r\nboot\r\nMicroPython v1.22.0 on sim\r\n>>> ')
+            return
+        except BaseException as e:
+            error = f'Traceback (most recent call last):\r\n  File "<stdin>"\r\n{_error(e)}\r\n'.encode()
+        finally:
+            sys.settrace(None)
+        if follow:
+            self.send(b'\x04' + error + b'\x04>')
+
+    def _builtins(self):
+        return dict(builtins.__dict__, open=self._open, print=self._print, __import__=self._import)
+
+    def _open(self, filename, mode='r', *args, **kwargs):
+        return builtins.open(self.path(filename), mode, *args, **kwargs)
+
+    def _print(self, *args, sep=' ', end='\n', file=None):
+        _Stdout(self).write(sep.join(str(arg) for arg in args) + end)
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level:
+            package = (globals or {}).get('__package__') or ''
+            name = '.'.join(package.split('.')[:len(package.split('.')) - (level - 1)] + ([name] if name else []))
+        parts = name.split('.')
+        for i in range(1, len(parts) + 1):
+            module = self._module('.'.join(parts[:i]))
+        if fromlist:
+            for attribute in fromlist:
+                if not hasattr(module, attribute):
+                    try:
+                        self._module(f'{name}.{attribute}')
+                    except ImportError:
+                        pass
+            return module
+        return self._module(parts[0])
+
+    def _module(self, name):
+        if name in self.modules:
+            return self.modules[name]
+        simulated = {
+            'os': self.os,
+            'uos': self.os,
+            'sys': types.SimpleNamespace(
+                stdout=_Stdout(self), path=self.sys_path, modules=self.modules, platform='sim',
+                implementation=types.SimpleNamespace(name='micropython', version=(1, 22, 0), _machine='sim')),
+            'machine': types.SimpleNamespace(unique_id=lambda: b'\xde\xad\xbe\xef', reset=_reset),
+            'time': _FakeTime(self),
+            'utime': _FakeTime(self),
+            'gc': types.SimpleNamespace(collect=lambda: None, mem_free=lambda: 100000, mem_alloc=lambda: 20000),
+            'deflate': types.SimpleNamespace(DeflateIO=_DeflateIO, ZLIB=1),
+            'ubinascii': binascii,
+            'uhashlib': hashlib}
+        if name in simulated:
+            return simulated[name]
+        if name in ('binascii', 'hashlib', 'json', 'struct', 'io', 'errno', 're', 'collections', 'micropython_compat'):
+            return __import__(name)
+        for directory in self.sys_path:
+            base = (directory.rstrip('/') + '/' if directory else '') + name.replace('.', '/')
+            for filename, is_package in ((base + '.py', False), (base + '/__init__.py', True)):
+                source = self._read(filename)
+                if source is not None:
+                    module = types.ModuleType(name)
+                    module.__file__ = filename
+                    module.__package__ = name if is_package else name.rpartition('.')[0]
+                    module.__builtins__ = self._builtins()
+                    self.modules[name] = module
+                    try:
+                        exec(compile(source, filename, 'exec'), module.__dict__)
+                    except BaseException:
+                        del self.modules[name]
+                        raise
+                    if '.' in name:
+                        setattr(self.modules[name.rpartition('.')[0]], name.rpartition('.')[2], module)
+                    return module
+        raise ImportError(f"no module named '{name}'")
+
+    def _read(self, filename):
+        """Return content of file `filename` (also on filesystems mounted with `os.mount()`), or `None`."""
+        for mount, vfs in self.os.mounts.items():
+            if filename.startswith(mount + '/'):
+                try:
+                    return vfs.open(filename[len(mount):], 'rb').read()
+                except OSError:
+                    return None
+        return open(self.path(filename), 'rb').read() if os.path.isfile(self.path(filename)) else None
+
+
+class _Stdout(object):
+    def __init__(self, mcu):
+        self.mcu = mcu
+
+    def write(self, data):
+        data = data.encode() if isinstance(data, str) else bytes(data)
+        self.mcu.send(data.replace(b'\n', b'\r\n'))
+        return len(data)
+
+
+class _FakeOS(object):
+    sep = '/'
+
+    def __init__(self, mcu):
+        self.mcu = mcu
+        self.cwd = '/'
+        self.mounts = {}  # mount point -> filesystem object (VFS)
+
+    def listdir(self, path=''):
+        return sorted(os.listdir(self.mcu.path(path)))
+
+    def ilistdir(self, path=''):
+        for name in self.listdir(path):
+            stat = self.stat((path.rstrip('/') + '/' if path else '') + name)
+            yield (name, stat[0] & 0x4000 or 0x8000, 0, stat[6])
+
+    def stat(self, path):
+        stat = os.stat(self.mcu.path(path))
+        return (0x4000 if os.path.isdir(self.mcu.path(path)) else 0x8000, 0, 0, 0, 0, 0, stat.st_size, 0, 0, 0)
+
+    def remove(self, path):
+        if os.path.isdir(self.mcu.path(path)):
+            raise OSError(errno.EISDIR, 'EISDIR')
+        os.remove(self.mcu.path(path))
+
+    def mkdir(self, path):
+        os.mkdir(self.mcu.path(path))
+
+    def rmdir(self, path):
+        os.rmdir(self.mcu.path(path))
+
+    def rename(self, source, destination):
+        os.replace(self.mcu.path(source), self.mcu.path(destination))
+
+    def chdir(self, path):
+        if not os.path.isdir(self.mcu.path(path)):
+            raise OSError(errno.ENOENT, 'ENOENT')
+        self.cwd = os.path.normpath(os.path.join(self.cwd, path)).replace(os.sep, '/')
+
+    def getcwd(self):
+        return self.cwd
+
+    def statvfs(self, path):
+        return (4096, 4096, 512, self.mcu.free_blocks, self.mcu.free_blocks, 0, 0, 0, 0, 255)
+
+    def uname(self):
+        return types.SimpleNamespace(sysname='sim', nodename='sim', release='1.22.0', version='v1.22.0 on sim', machine='sim')
+
+    def mount(self, vfs, path):
+        self.mounts[path] = vfs
+
+    def umount(self, path):
+        if path not in self.mounts:
+            raise OSError(errno.EINVAL, 'EINVAL')
+        del self.mounts[path]
+
+
+class _FakeTime(object):
+    def __init__(self, mcu):
+        self.mcu = mcu
+
+    def sleep(self, seconds):
+        time_end = time.time() + seconds
+        while time.time() < time_end:
+            if self.mcu.interrupt.is_set():
+                self.mcu.interrupt.clear()
+                raise KeyboardInterrupt()
+            time.sleep(0.005)
+
+    def sleep_ms(self, ms):
+        self.sleep(ms / 1000)
+
+    def ticks_us(self):
+        return time.perf_counter_ns() // 1000
+
+    def ticks_ms(self):
+        return time.perf_counter_ns() // 10**6
+
+    def ticks_diff(self, a, b):
+        return a - b
+
+    def time(self):
+        return time.time()
+
+
+class _DeflateIO(object):
+    def __init__(self, stream, format, wbits=0, close=False):
+        self.stream = stream
+        self.compressor = zlib.compressobj()
+
+    def write(self, data):
+        self.stream.write(self.compressor.compress(bytes(data)))
+        return len(data)
+
+    def close(self):
+        self.stream.write(self.compressor.flush())
+
+
+def _reset():
+    raise _Reset()
+
+
+def _error(e):
+    """Return last line of MicroPython traceback for exception `e`."""
+    if isinstance(e, OSError) and e.errno:
+        return f'OSError: [Errno {e.errno}] {errno.errorcode.get(e.errno, "")}'
+    if isinstance(e, KeyboardInterrupt):
+        return 'KeyboardInterrupt: '
+    return f'{e.__class__.__name__}: {e}'
+
+
+@pytest.fixture
+def mcu(tmp_path, monkeypatch):
+    """Simulated MCU on port `/dev/ttySIM` (cache files are written in temporary current directory)."""
+    mcu = FakeMCU(str(tmp_path / 'mcu'))
+    monkeypatch.setattr(serial, 'Serial', lambda *args, **kwargs: mcu)
+    monkeypatch.chdir(tmp_path)
+    return mcu
+
+
+def make_device(**device_config):
+    return device_module.Device(config_module.Config(override={'device': dict({'port': '/dev/ttySIM', 'softreset': False}, **device_config)}))
+
+
+@pytest.fixture
+def device(mcu):
+    """`Device` connected to simulated MCU."""
+    return make_device()
+
+
+@pytest.fixture
+def project(tmp_path, mcu):
+    """Write config file and sources of a project, and return `Config` - eg. `project({'app': {...}}, {'main.py': '...'})`."""
+    def project(packages, files={}, device={}):
+        for filename, content in files.items():
+            path = tmp_path / 'project' / filename
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+        config = {'packages': packages, 'device': dict({'port': '/dev/ttySIM', 'softreset': False}, **device)}
+        import yaml
+        (tmp_path / 'project').mkdir(exist_ok=True)
+        (tmp_path / 'project' / 'microdeploy.yaml').write_text(yaml.dump(config))
+        return config_module.Config(str(tmp_path / 'project' / 'microdeploy.yaml'))
+    return project
@@ -0,0 +1,42 @@
+from microdeploy import aio
+from conftest import make_device
+import asyncio
+import pytest
+
+
+def test_device_operations(mcu, tmp_path):
+    (tmp_path / 'main.py').write_text('v = 1\n')
+    async def main():
+        device = aio.AsyncDevice(make_device().config)
+        assert await device.put(str(tmp_path / 'main.py'), 'main.py')
+        assert '/main.py' in await device.ls('/')
+        assert await device.exec('print(1 + 1)') == '2\r\n'
+        with pytest.raises(aio.DeviceError):  # Note: not `PyboardError`, which escapes `except Exception`
+            await device.exec('raise ValueError()')
+        await device.close()
+    asyncio.run(main())
+
+
+def test_package_push(project, mcu):
+    config = project({'app': {'files': ['main.py']}}, {'main.py': 'v = 1\n'})
+    async def main():
+        device = aio.AsyncDevice(config)
+        assert await aio.AsyncPackage(device).names() == ['app']
+        await aio.AsyncPackage(device).push('app')
+        await device.close()
+    asyncio.run(main())
+    assert open(mcu.path('/main.py')).read() == 'v = 1\n'
+
+
+def test_cancel_interrupts_script(mcu, tmp_path):
+    (tmp_path / 'loop.py').write_text('while True:\n    pass\n')
+    async def main():
+        device = aio.AsyncDevice(make_device().config)
+        task = asyncio.ensure_future(device.run(str(tmp_path / 'loop.py')))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert await device.exec('print(2)') == '2\r\n'  # Note: serial port released after interrupt
+        await device.close()
+    asyncio.run(asyncio.wait_for(main(), 10))
@@ -0,0 +1,52 @@
+from microdeploy import console as console_module
+import threading
+import serial
+import pytest
+import io
+import os
+
+
+class Port(object):
+    """Port without file descriptor (as on Windows), having `data` to read."""
+    def __init__(self, data):
+        self.data = data
+        self.closed = False
+    @property
+    def in_waiting(self):
+        return len(self.data)
+    def read(self, size=1):
+        data, self.data = self.data[:size], self.data[size:]
+        return data
+    def close(self):
+        self.closed = True
+
+
+def test_monitor_polls_ports_without_file_descriptor(monkeypatch):
+    ports = {'/dev/a': Port(b'hello\r\nwor'), '/dev/b': Port(b'line\n')}
+    monkeypatch.setattr(serial, 'Serial', lambda port, *args, **kwargs: ports[port])
+    output = io.BytesIO()
+    monitor = console_module.Monitor({'a': '/dev/a', 'b': '/dev/b'}, output=output)
+    assert monitor.run(duration=0.2) == {'a': 10, 'b': 5}
+    assert sorted((name, line) for timestamp, name, line in monitor.buffer) == [('a', 'hello'), ('a', 'wor'), ('b', 'line')]
+    assert output.getvalue().count(b' [a] ') == 2 and all(port.closed for port in ports.values())
+
+
+@pytest.mark.skipif(not hasattr(os, 'openpty'), reason='pseudo-terminals are POSIX only')
+def test_monitor_selects_ports(tmp_path):
+    master, slave = os.openpty()
+    threading.Timer(0.1, os.write, (master, b'boot\r\nready\r\n')).start()  # Note: input is flushed when port is opened
+    monitor = console_module.Monitor({'mcu': os.ttyname(slave)}, logdir=str(tmp_path), output=io.BytesIO())
+    assert monitor.run(duration=0.5) == {'mcu': 13}
+    assert [line for timestamp, name, line in monitor.buffer] == ['boot', 'ready']
+    assert open(tmp_path / 'mcu.log', 'rb').read().endswith(b' [mcu] ready\n')
+    os.close(master)
+    os.close(slave)
+
+
+def test_rotating_log(tmp_path):
+    log = console_module._RotatingLog(str(tmp_path / 'logs' / 'mcu.log'), max_bytes=10, count=2, buffering=0)
+    for data in (b'aaaaaaaa\n', b'bbbbbbbb\n', b'cccccccc\n', b'dddddddd\n'):
+        log.write(data)
+    log.close()
+    assert sorted(os.listdir(tmp_path / 'logs')) == ['mcu.log', 'mcu.log.1', 'mcu.log.2']
+    assert [open(tmp_path / 'logs' / filename, 'rb').read() for filename in ('mcu.log', 'mcu.log.1', 'mcu.log.2')] == [b'dddddddd\n', b'cccccccc\n', b'bbbbbbbb\n']
@@ -0,0 +1,32 @@
+from microdeploy import package as package_module
+import os
+
+
+def test_freeze(project, tmp_path):
+    config = project({'app': {'files': ['main.py', 'app/*.py', 'lib/*.py', 'data.txt'], 'freeze': {'opt': 3}}}, {
+        'main.py': 'import app\n',
+        'app/__init__.py': 'from .util import x\n',
+        'app/util.py': 'import helper\nx = 1\n',
+        'lib/helper.py': 'pass\n',
+        'data.txt': 'kept\n'})
+    output = str(tmp_path / 'freeze')
+    result = package_module.Package(config).freeze('app', output=output)
+    assert result['frozen'] == ['app', 'app.util', 'helper']
+    assert result['filesystem'] == ['main.py', 'data.txt']
+    assert open(result['manifest']).read().splitlines()[1:] == [
+        "include('$(PORT_DIR)/boards/manifest.py')",
+        "freeze('modules', 'app/__init__.py', opt=3)",
+        "freeze('modules', 'app/util.py', opt=3)",
+        "freeze('modules/lib', 'helper.py', opt=3)"]
+    assert sorted(os.listdir(os.path.join(output, 'modules'))) == ['app', 'lib']
+    assert open(os.path.join(output, 'modules', 'lib', 'helper.py')).read() == 'pass\n'
+
+
+def test_freeze_again(project, tmp_path):
+    config = project({'app': {'files': ['main.py', 'lib/*.py']}}, {'main.py': 'import helper\n', 'lib/helper.py': 'pass\n'})
+    package = package_module.Package(config)
+    package.freeze('app')
+    os.remove(tmp_path / 'project' / 'lib' / 'helper.py')
+    result = package.freeze('app')  # Note: nothing to freeze
+    assert result['frozen'] == [] and result['filesystem'] == ['main.py']
+    assert not os.path.exists(os.path.join(os.path.dirname(result['manifest']), 'modules'))
@@ -0,0 +1,48 @@
+from conftest import make_device
+import json
+import os
+
+
+def test_hashcache(mcu):
+    hashcache = make_device().hashcache
+    assert hashcache.get('a.py') is None
+    hashcache.add('a.py', b'a = 1\n')
+    assert hashcache.same('/a.py', b'a = 1\n') and not hashcache.same('a.py', b'a = 2\n')
+    hashcache.copy('a.py', 'b.py')
+    hashcache.copy('missing.py', 'a.py')
+    assert hashcache._read() == {'/b.py': hashcache._hash(b'a = 1\n')}
+    hashcache.remove('b.py')
+    assert hashcache._read() == {}
+
+
+def test_hashcache_per_device(mcu):
+    make_device().hashcache.add('a.py', b'a = 1\n')
+    assert make_device(port='/dev/ttyOTHER').hashcache.get('a.py') is None
+    assert make_device().hashcache.get('a.py')
+
+
+def test_history_and_throughput(mcu):
+    hashcache = make_device().hashcache
+    hashcache.add_push('app', 0, files=2, files_total=3, bytes=100, errors=1)
+    hashcache.add_throughput(1000, 1.0)
+    hashcache.add_throughput(1000, 3.0)
+    make_device(port='/dev/ttyOTHER').hashcache.add_push('app', 0, files=1, files_total=1, bytes=1, errors=0)
+    history = hashcache.history()
+    assert [(push['package'], push['files'], push['errors']) for push in history['pushes']] == [('app', 2, 1)]
+    assert history['throughput'] == {'/dev/ttySIM': '4000 bits/s'}
+    assert len(hashcache.history(all_devices=True)['pushes']) == 2
+
+
+def test_push_recorded(device, tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1\n')
+    assert device.put(str(tmp_path / 'a.py'), 'a.py') == 6
+    assert device.hashcache.get('a.py') == device.hashcache._hash(b'a = 1\n')
+    assert device.hashcache.db.execute('SELECT bytes FROM throughput').fetchone()['bytes'] == 6
+
+
+def test_migrate_json_cache(mcu):
+    with open('.microdeploy.hashcache', 'w') as f:
+        f.write(json.dumps({'/a.py': 'abc'}))
+    hashcache = make_device().hashcache
+    assert hashcache.get('a.py') == 'abc'
+    assert os.path.exists('.microdeploy.hashcache.migrated') and not os.path.exists('.microdeploy.hashcache')
@@ -0,0 +1,36 @@
+from microdeploy import package as package_module
+from microdeploy import image as image_module
+import warnings
+import pytest
+
+
+FILES = {'main.py': b'import lib.mod\n', 'lib/mod.py': b'x = 1\n', 'data.bin': bytes(range(256)) * 20}
+
+
+@pytest.mark.parametrize('format', image_module.FORMATS)
+def test_build_and_verify(tmp_path, format):
+    filename = str(tmp_path / 'fs.img')
+    information = image_module.build(filename, FILES, 0x40000, format=format)
+    assert information['files'] == 3 and information['bytes'] == sum(len(data) for data in FILES.values())
+    with pytest.raises(RuntimeError, match='file differs: /lib/mod.py'):
+        image_module.verify(filename, dict(FILES, **{'lib/mod.py': b'x = 2\n'}), format=format)
+    with pytest.raises(RuntimeError, match='unexpected file: /data.bin'):
+        image_module.verify(filename, {'/main.py': FILES['main.py'], '/lib/mod.py': FILES['lib/mod.py']}, format=format)
+
+
+def test_build_errors(tmp_path):
+    with pytest.raises(ValueError, match='not supported'):
+        image_module.build(str(tmp_path / 'fs.img'), FILES, 0x40000, format='spiffs')
+    with pytest.raises(ValueError, match='multiple of block size'):
+        image_module.build(str(tmp_path / 'fs.img'), FILES, 1000)
+
+
+def test_package_image_compiles_modules(project, tmp_path):
+    config = project({'app': {'files': ['main.py', 'lib/mod.py'], 'mpy': True, 'image': {'size': 0x40000}}},
+        {'main.py': 'import lib.mod\n', 'lib/mod.py': 'x = 1\n'})
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)  # Note: eg. invalid escape sequence in regular expression
+        information = package_module.Package(config).image('app')
+    files = image_module._read_littlefs(information['image'], information['block_size'])
+    assert sorted(files) == ['/lib/mod.mpy', '/main.py']
+    assert files['/lib/mod.mpy'].startswith(b'M')
@@ -0,0 +1,71 @@
+from microdeploy import Microdeploy
+from conftest import make_device
+import serial.tools.list_ports
+import threading
+import serial
+import types
+import time
+import pytest
+import os
+
+
+class HungPort(object):
+    """Port that never answers (eg. no MCU, or port held by another program)."""
+    timeout = None
+    def write(self, data):
+        return len(data)
+    def inWaiting(self):
+        return 0
+    def read(self, size=1):
+        threading.Event().wait()
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def ports(mcu, monkeypatch):
+    """Ports `/dev/ttySIM` (simulated MCU, serial number `SN1`) and `/dev/ttyHUNG`."""
+    monkeypatch.setattr(serial, 'Serial', lambda port, *args, **kwargs: mcu if port == '/dev/ttySIM' else HungPort())
+    monkeypatch.setattr(serial.tools.list_ports, 'comports', lambda: [
+        types.SimpleNamespace(device='/dev/ttySIM', serial_number='SN1'),
+        types.SimpleNamespace(device='/dev/ttyHUNG', serial_number='SN2')])
+
+
+def test_inventory_reports_hung_port_unavailable(project, ports, tmp_path, capsys):
+    project({}, device={'port': '/dev/ttySIM'})
+    microdeploy = Microdeploy(config=str(tmp_path / 'project' / 'microdeploy.yaml'), debug=True)
+    time_start = time.time()
+    inventory = microdeploy.inventory(timeout=2)
+    assert time.time() - time_start < 3
+    assert list(inventory) == ['/dev/ttySIM']
+    assert inventory['/dev/ttySIM']['unique_id'] == 'deadbeef'
+    assert 'Probe failed: /dev/ttyHUNG: timeout' in capsys.readouterr().err
+
+
+def test_device_addressed_by_unique_id(ports, tmp_path):
+    make_device().hashcache.inventory_add('SN1', '/dev/ttySIM', {'unique_id': 'deadbeef'})
+    device = make_device(port='deadbeef')
+    assert device.port == '/dev/ttySIM'
+    assert device.hashcache.device_id == make_device().hashcache.device_id  # Note: same cache as when addressed by port
+    assert device.exec('print(1)') == '1\r\n'
+
+
+def test_device_addressed_by_unique_id_with_legacy_cache(ports):
+    make_device().hashcache.inventory_add('SN1', '/dev/ttySIM', {'unique_id': 'deadbeef'})
+    with open('.microdeploy.hashcache', 'w') as f:
+        f.write('{"/a.py": "abc"}')
+    device = make_device(port='deadbeef')  # Note: legacy cache is migrated when resolving port
+    assert device.port == '/dev/ttySIM'
+    assert os.path.exists('.microdeploy.hashcache.migrated')
+
+
+def test_device_not_found(ports):
+    device = make_device(port='unknown')  # Note: no error until connecting
+    with pytest.raises(ValueError, match='Device not found: unknown'):
+        device.ls()
+
+
+def test_probe(device, mcu):
+    info = device.probe()
+    assert info['unique_id'] == 'deadbeef' and info['raw_paste'] is False and info['free'] == 256 * 4096
+    assert mcu.soft_reboots == 0
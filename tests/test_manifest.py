@@ -0,0 +1,96 @@
+from microdeploy import package as package_module
+from conftest import make_device
+import json
+import os
+import pytest
+
+
+def source(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def manifest(mcu):
+    path = mcu.path('/.microdeploy.manifest')
+    return json.load(open(path)) if os.path.exists(path) else None
+
+
+def test_manifest_saved_with_session(device, mcu, tmp_path):
+    with device.session():
+        assert device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py')
+    assert list(manifest(mcu)) == ['/main.py']
+    with device.session():
+        assert device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py') == 0
+
+
+def test_manifest_from_other_host(device, mcu, tmp_path):
+    with device.session():
+        device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py')
+    os.remove('.microdeploy.db')  # Note: hashcache of another host
+    with make_device().session() as other:
+        assert other.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py') == 0
+
+
+def test_interrupted_session_leaves_no_stale_manifest(device, mcu, tmp_path):
+    with device.session():
+        device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py')
+    with pytest.raises(KeyboardInterrupt):
+        with device.session():
+            device.put(source(tmp_path, 'main.py', 'v = 2\n'), 'main.py')
+            raise KeyboardInterrupt()
+    assert open(mcu.path('/main.py')).read() == 'v = 2\n'
+    with device.session():
+        assert device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py')
+    assert open(mcu.path('/main.py')).read() == 'v = 1\n'
+
+
+def test_interrupted_session_without_save(device, mcu, tmp_path):
+    with device.session():
+        device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py')
+    device.manifest.save = lambda: None  # Note: eg. interrupted again while saving
+    with pytest.raises(KeyboardInterrupt):
+        with device.session():
+            device.put(source(tmp_path, 'main.py', 'v = 2\n'), 'main.py')
+            raise KeyboardInterrupt()
+    assert manifest(mcu) is None
+    del device.manifest.save
+    with device.session():
+        assert device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py')
+
+
+def test_manifest_updated_outside_session(device, mcu, tmp_path):
+    device.put(source(tmp_path, 'a.py', 'a = 1\n'), 'a.py')
+    device.put(source(tmp_path, 'b.py', 'b = 1\n'), 'lib/b.py')
+    assert sorted(manifest(mcu)) == ['/a.py', '/lib/b.py']
+    device.copy('a.py', 'c.py')
+    device.rename('c.py', 'd.py')
+    assert sorted(manifest(mcu)) == ['/a.py', '/d.py', '/lib/b.py']
+    device.rm('a.py')
+    device.rmdir('lib')
+    assert sorted(manifest(mcu)) == ['/d.py']
+
+
+def test_push_after_rm(project, mcu):
+    config = project({'app': {'files': ['main.py']}}, {'main.py': 'v = 1\n'})
+    package = package_module.Package(config)
+    package.push('app')
+    package.device.rm('main.py')
+    output = []
+    package.push('app', _progress=output.append)
+    assert 'Put: ' in ''.join(output)
+    assert open(mcu.path('/main.py')).read() == 'v = 1\n'
+
+
+def test_hashcache_without_manifest(device, mcu, tmp_path):
+    with device.session():
+        device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py')
+    os.remove(mcu.path('/.microdeploy.manifest'))  # Note: eg. push killed, or board pushed before manifest
+    with device.session():
+        assert device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py') == 0
+    assert list(manifest(mcu)) == ['/main.py']  # Note: written again
+    device.hashcache.db.close()
+    os.remove('.microdeploy.db')
+    device.hashcache._connection = None
+    with device.session():
+        assert device.put(source(tmp_path, 'main.py', 'v = 1\n'), 'main.py') == 0  # Note: manifest found, hashcache not used
@@ -0,0 +1,25 @@
+from microdeploy import package as package_module
+
+
+FILES = {'main.py': 'import app\n', 'lib/app.py': 'import helper\nprint("app from", __file__)\n', 'lib/helper.py': 'x = 1\n'}
+
+
+def test_pack(project):
+    config = project({'app': {'files': ['main.py', 'lib/*.py']}}, FILES)
+    bundle = package_module.Package(config).pack('app')
+    namespace = {}
+    exec(open(bundle).read().split('\nimport sys\n', 1)[0], namespace)  # Note: variables only, mounting is MicroPython specific
+    assert sorted(namespace['_SOURCES']) == ['/lib/app.py', '/lib/helper.py', '/main.py']
+    assert sorted(namespace['_MODULES']) == ['app', 'helper']  # Note: modules in /lib are imported without `lib.`
+
+
+def test_run_compare_imports_from_files(project, mcu):
+    config = project({'app': {'files': ['main.py', 'lib/*.py']}}, FILES)
+    package = package_module.Package(config)
+    package.push('app')
+    output = []
+    package.run('app', compare=True, _progress=output.append)
+    bundle, files = ''.join(output).split('(from files on MCU)')
+    assert 'app from /_pack/lib/app.py' in bundle and 'imported 2 modules from bundle' in bundle
+    assert 'app from /lib/app.py' in files and 'imported 2 modules from files' in files
+    assert '/_pack' not in mcu.os.mounts and '/_pack' not in mcu.sys_path
@@ -0,0 +1,22 @@
+from microdeploy import package as package_module
+import json
+
+
+def test_profile(project, mcu, tmp_path):
+    config = project({'app': {'files': ['main.py', 'boot.py', 'app/*.py', 'lib/*.py'], 'timeout': 5}}, {
+        'main.py': 'import app\nwhile True:\n    pass\n',
+        'boot.py': 'raise SystemExit()\n',
+        'app/__init__.py': 'from .util import x\n',
+        'app/util.py': 'import helper\nx = 1\n',
+        'app/broken.py': 'raise ValueError("boom")\n',
+        'lib/helper.py': 'import time\ntime.sleep(0.01)\n'})
+    package = package_module.Package(config)
+    package.push('app')
+    output = []
+    report = package.profile('app', output=str(tmp_path / 'report.json'), _progress=output.append)
+    assert sorted(row['module'] for row in report) == ['app', 'app.broken', 'app.util', 'helper']  # Note: not `lib.helper`, entry scripts not run
+    assert report[0]['module'] == 'helper'  # Note: sorted by import time
+    assert [row['error'] for row in report if row['error']] == ["ValueError('boom')"]
+    assert all(row['mem_free'] == 100000 for row in report)
+    assert 'ERROR: ' in ''.join(output) and '(total)' in ''.join(output)
+    assert json.load(open(tmp_path / 'report.json')) == report
@@ -0,0 +1,26 @@
+import os
+import pytest
+
+
+def tree(path):
+    return {os.path.relpath(os.path.join(directory, filename), path): open(os.path.join(directory, filename), 'rb').read()
+        for directory, directories, filenames in os.walk(path) for filename in filenames}
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_pull(device, mcu, tmp_path, compress):
+    files = {'main.py': b'import config\n', 'data/config.json': b'{"a": 1}\n' * 100, 'data/log/1.bin': bytes(range(256)) * 20}
+    for destination, data in files.items():
+        (tmp_path / 'src.bin').write_bytes(data)
+        device.put(str(tmp_path / 'src.bin'), destination, parents_create=True)
+    output = []
+    manifest = open(mcu.path('/.microdeploy.manifest'), 'rb').read()
+    assert device.pull(str(tmp_path / 'backup'), compress=compress, _progress=output.append) == sum(len(data) for data in files.values()) + len(manifest)
+    assert tree(tmp_path / 'backup') == dict(files, **{'.microdeploy.manifest': manifest})
+    bytes_transferred = int(output[-1].split('(')[1].split()[0])
+    assert bytes_transferred < 2000 if compress else bytes_transferred > 6000
+    (tmp_path / 'backup' / 'main.py').write_bytes(b'changed\n')
+    assert device.pull(str(tmp_path / 'backup'), compress=compress, _progress=output.append) == len(files['main.py'])  # Note: others up-to-date
+    assert '3 files up-to-date' in output[-1]
+    assert device.pull('data/log', str(tmp_path / 'log'), compress=compress) == len(files['data/log/1.bin'])
+    assert tree(tmp_path / 'log') == {'1.bin': files['data/log/1.bin']}
@@ -0,0 +1,50 @@
+from microdeploy import package as package_module
+import pytest
+import os
+
+
+FILES = {'a.py': 'a = 1\n', 'b.py': 'b = 1\n', 'c.py': 'c = 1\n'}
+
+
+def test_push_resume(project, mcu):
+    config = project({'app': {'files': ['a.py', 'b.py', 'c.py']}}, FILES)
+    package = package_module.Package(config)
+    put = package.device.put
+    def put_failing(source, destination=None, **kwargs):
+        if destination == 'b.py':
+            raise RuntimeError('connection lost')
+        return put(source, destination, **kwargs)
+    package.device.put = put_failing
+    with pytest.raises(RuntimeError, match='connection lost'):
+        package.push('app')
+    assert package.journal.read('app', '/dev/ttySIM')['done'] == ['a.py']
+    del package.device.put
+    output = []
+    package.push('app', resume=True, _progress=output.append)
+    output = ''.join(output)
+    assert 'Resuming package: app: 1/3 files already pushed' in output
+    assert output.count('Put: ') == 2 and 'Put: project/a.py' not in output
+    assert package.journal.read('app', '/dev/ttySIM') is None
+    assert sorted(os.listdir(mcu.root)) == ['.microdeploy.manifest', 'a.py', 'b.py', 'c.py']
+
+
+def test_put_atomic(device, mcu, tmp_path, monkeypatch):
+    (tmp_path / 'a.py').write_text('a = 1\n')
+    device.put(str(tmp_path / 'a.py'), 'a.py')
+    (tmp_path / 'a.py').write_text('a = 2\n')
+    monkeypatch.setattr(device, 'rename', lambda source, destination: (_ for _ in ()).throw(KeyboardInterrupt()))  # Note: interrupted before rename
+    with pytest.raises(KeyboardInterrupt):
+        device.put(str(tmp_path / 'a.py'), 'a.py')
+    assert open(mcu.path('/a.py')).read() == 'a = 1\n'
+
+
+def test_journal(tmp_path):
+    journal = package_module._Journal(str(tmp_path / 'journal'))
+    assert journal.read('app', '/dev/a') is None
+    journal.write('app', '/dev/a', [['a.py', 'a.py']], [])
+    assert journal.read('app', '/dev/a') == {'package': 'app', 'device': '/dev/a', 'files': [['a.py', 'a.py']], 'done': []}
+    assert journal.read('other', '/dev/a') is None
+    assert journal.read('app', '/dev/b') is None  # Note: not pushed to this device
+    journal.clear()
+    journal.clear()
+    assert journal.read('app', '/dev/a') is None
@@ -0,0 +1,23 @@
+from conftest import make_device
+
+
+def test_reset_waits_until_ready(mcu):
+    device = make_device(ready='>>> ')
+    assert device.reset() is not None
+    assert mcu.resets == 1
+    assert device.exec('print(1)') == '1\r\n'
+
+
+def test_reset_not_ready(mcu):
+    device = make_device(ready='never printed')
+    output = []
+    assert device.reset(timeout=0.3, _progress=output.append) is None
+    assert "not ready after 0.3s (waiting for: 'never printed')" in ''.join(output)
+
+
+def test_reset_in_session(mcu):
+    device = make_device(ready='>>> ')
+    with device.session():
+        device.exec('x = 1')
+        device.reset()
+        assert device.exec('print(globals().get("x"))') == 'None\r\n'  # Note: raw REPL entered again after reset
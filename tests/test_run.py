@@ -0,0 +1,71 @@
+from microdeploy.device import ampy_pyboard, _RUN_CACHE_DIRECTORY
+from microdeploy import package as package_module
+import pytest
+import os
+
+
+def script(tmp_path, name, source):
+    path = tmp_path / name
+    path.write_text(source)
+    return str(path)
+
+
+def test_run_streams_lines(device, tmp_path):
+    lines = []
+    output = device.run(script(tmp_path, 'a.py', 'for i in range(3):\n    print("line", i)\n'), _progress=lines.append)
+    assert lines == ['line 0\r\n', 'line 1\r\n', 'line 2\r\n']
+    assert output == ''.join(lines)
+
+
+def test_run_twice_in_session(device, tmp_path):
+    with device.session():
+        assert device.run(script(tmp_path, 'a.py', 'print(1)')) == '1\r\n'
+        assert device.run(script(tmp_path, 'b.py', 'print(2)')) == '2\r\n'
+        assert device.exec('print(3)') == '3\r\n'
+        device.put(script(tmp_path, 'c.py', 'x = 1\n'), 'c.py')
+    assert device.get('c.py') == b'x = 1\n'
+
+
+def test_run_error(device, tmp_path):
+    with pytest.raises(ampy_pyboard.PyboardError, match='ZeroDivisionError'):
+        device.run(script(tmp_path, 'a.py', 'print(1)\n1/0\n'))
+    assert device.run(script(tmp_path, 'b.py', 'print(2)')) == '2\r\n'
+
+
+def test_run_timeout_interrupts_script(device, mcu, tmp_path):
+    with pytest.raises(ampy_pyboard.PyboardError, match='timeout'):
+        device.run(script(tmp_path, 'a.py', 'import time\nprint("start")\ntime.sleep(60)\n'), timeout=0.5)
+    mcu.wait()
+    assert device.run(script(tmp_path, 'b.py', 'print(2)')) == '2\r\n'
+
+
+def test_run_output_is_bounded(device, tmp_path):
+    device.pyboard.enter_raw_repl()
+    device.pyboard.exec_raw_no_follow('for i in range(1000):\n    print("x" * 99)\n')
+    output, error = device.pyboard.follow_lines(max_bytes=1000)
+    device.pyboard.exit_raw_repl()
+    assert 1000 - 101 <= len(output) <= 1000 and not error
+
+
+def test_run_cache(device, mcu, tmp_path):
+    output = []
+    assert device.run(script(tmp_path, 'test-run.py', 'print(1)\n'), cache=True, _progress=output.append) == '1\r\n'
+    assert [state for state in output if state.startswith('Put: ')]
+    output.clear()
+    assert device.run(script(tmp_path, 'test-run.py', 'print(1)\n'), cache=True, _progress=output.append) == '1\r\n'  # Note: imported again
+    assert output == ['1\r\n']
+    assert device.run(script(tmp_path, 'test-run.py', 'print(2)\n'), cache=True) == '2\r\n'
+    cached = os.listdir(mcu.path(_RUN_CACHE_DIRECTORY))
+    assert len(cached) == 1 and cached[0].startswith('test_run_')  # Note: previous version removed
+    os.remove(os.path.join(mcu.path(_RUN_CACHE_DIRECTORY), cached[0]))
+    assert device.run(script(tmp_path, 'test-run.py', 'print(2)\n'), cache=True) == '2\r\n'  # Note: uploaded again
+    assert os.listdir(mcu.path(_RUN_CACHE_DIRECTORY)) == cached
+
+
+def test_push_run_cache(project, mcu):
+    config = project({'app': {'files': ['main.py'], 'run': ['run.py'], 'run_cache': True}}, {'main.py': 'v = 1\n', 'run.py': 'print("ran")\n'})
+    package = package_module.Package(config)
+    package.push('app')
+    output = []
+    package.push('app', _progress=output.append)
+    assert 'ran\r\n' in output and not [state for state in output if state.startswith('Put: ')]
@@ -0,0 +1,33 @@
+from conftest import make_device
+
+
+def test_softreset_per_operation(mcu):
+    device = make_device(softreset=True)
+    device.exec('pass')
+    device.exec('pass')
+    assert mcu.soft_reboots == 2
+
+
+def test_session_softreset_once(mcu):
+    device = make_device(softreset=True)
+    with device.session():
+        for i in range(3):
+            assert device.exec(f'print({i})') == f'{i}\r\n'
+        with device.session():  # Note: nested sessions share raw REPL
+            device.exec('pass')
+    assert mcu.soft_reboots == 1
+    assert mcu.mode == 'friendly'
+
+
+def test_without_softreset(device, mcu):
+    device.exec('x = 1')
+    assert device.exec('print(x)') == '1\r\n'  # Note: state is kept
+    assert mcu.soft_reboots == 0
+
+
+def test_get_softreset_once(mcu):
+    device = make_device(softreset=True)
+    with open(mcu.path('/a.py'), 'w') as f:
+        f.write('a = 1\n')
+    assert device.get('a.py') == b'a = 1\n'
+    assert mcu.soft_reboots == 1
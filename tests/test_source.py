@@ -0,0 +1,65 @@
+from microdeploy import source as source_module
+from microdeploy import package as package_module
+import os
+
+
+def test_minify():
+    source = '"""Module."""\n\nimport os  # comment\n\n\ndef f(a,  b):\n    """Docstring."""\n    return """text\n  kept"""\n'
+    assert source_module.minify(source) == 'import os\ndef f(a,  b):\n return """text\n  kept"""\n'  # Note: indented by one space per level
+    assert source_module.minify(source, lines=True).count('\n') == source.count('\n')
+
+
+def test_minify_docstring_only_body():
+    assert source_module.minify('class A:\n    """Docstring."""\n') == 'class A:\n pass\n'
+
+
+def test_imports(tmp_path):
+    (tmp_path / 'a.py').write_text('import os, b\nfrom . import c\nfrom .d import e\ndef f():\n    __import__("g")\n')
+    expected = [[0, 'os', []], [0, 'b', []], [1, '', ['c']], [1, 'd', ['e']], [0, 'g', []]]
+    assert sorted(source_module.imports(str(tmp_path / 'a.py'), cachedir=str(tmp_path / 'cache'))) == sorted(expected)
+    assert len(os.listdir(tmp_path / 'cache')) == 1
+    assert sorted(source_module.imports(str(tmp_path / 'a.py'), cachedir=str(tmp_path / 'cache'))) == sorted(expected)
+
+
+def files(tmp_path, sources):
+    for destination, source in sources.items():
+        (tmp_path / destination).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / destination).write_text(source)
+    return [(str(tmp_path / destination), destination) for destination in sources]
+
+
+def test_shake_and_order(tmp_path):
+    package_files = files(tmp_path, {
+        'main.py': 'import app\n',
+        'app/__init__.py': 'from .util import x\n',
+        'app/util.py': 'import helper\nx = 1\n',
+        'lib/helper.py': 'pass\n',
+        'lib/unused.py': 'pass\n',
+        'data.txt': 'kept\n'})
+    shaken = source_module.shake(package_files, [str(tmp_path / 'main.py')])
+    assert [destination for source, destination in shaken] == ['main.py', 'app/__init__.py', 'app/util.py', 'lib/helper.py', 'data.txt']
+    order = source_module.order(shaken)
+    assert order.index('helper') < order.index('app.util') < order.index('app') < order.index('main')
+
+
+def test_package_import_cache(project, tmp_path):
+    config = project({'app': {'files': ['main.py', 'lib/*.py'], 'shake': True}}, {'main.py': 'import a\n', 'lib/a.py': 'pass\n', 'lib/b.py': 'pass\n'})
+    package = package_module.Package(config)
+    assert [destination for source, destination in package.files('app')] == ['main.py', 'lib/a.py']
+    assert not os.path.exists(package.builddir)  # Note: read-only command writes no cache
+    package.builddir = str(tmp_path / 'build')
+    assert [destination for source, destination in package._files('app')] == ['main.py', 'lib/a.py']
+    assert len(os.listdir(tmp_path / 'build' / 'imports')) == 2
+
+
+def test_push_minified(project, mcu):
+    config = project({'app': {'files': ['a.py', 'b.py'], 'minify': True}, 'lines': {'files': ['a.py'], 'minify': {'lines': True}}},
+        {'a.py': '# comment\n\ndef f():\n    """Docstring."""\n    return 1\n', 'b.txt': 'not python\n', 'b.py': 'x = 1\n'})
+    package = package_module.Package(config)
+    output = []
+    package.push('app', _progress=output.append)
+    assert open(mcu.path('/a.py')).read() == 'def f():\n return 1\n'
+    assert 'Minified: saved 35 bytes in package: app.' in ''.join(output)
+    assert len(os.listdir(os.path.join(package.builddir, 'minify'))) == 2
+    package.push('lines', force=True)
+    assert open(mcu.path('/a.py')).read() == '\n\ndef f():\n\n return 1\n'
@@ -0,0 +1,44 @@
+from microdeploy import package as package_module
+import os
+import pytest
+
+
+def test_df(device, mcu, tmp_path):
+    (tmp_path / 'a.py').write_text('a' * 100)
+    device.put(str(tmp_path / 'a.py'), 'lib/sub/a.py', parents_create=True)
+    device.put(str(tmp_path / 'a.py'), 'b.py')
+    df = device.df()
+    assert df['free'] == mcu.free_blocks * 4096 and df['block_size'] == 4096
+    assert df['directories']['/lib'] == df['directories']['/lib/sub'] == 100
+    assert df['directories']['/'] >= 200
+
+
+def test_space_of_replaced_files(device, tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1\n')
+    device.put(str(tmp_path / 'a.py'), 'a.py')
+    assert device.space(['/a.py', '/missing.py'])['sizes'] == {'/a.py': 6, '/missing.py': None}
+
+
+def test_push_without_space(project, mcu):
+    config = project({'app': {'files': ['a.py', 'b.py']}}, {'a.py': 'a = 1\n', 'b.py': 'b = 1\n'})
+    package = package_module.Package(config)
+    mcu.free_blocks = 2  # Note: 2 files and temporary file need 3 blocks
+    with pytest.raises(RuntimeError, match='Not enough space on MCU for package: app: 12288 bytes needed, 8192 bytes free'):
+        package.push('app')
+    assert not os.path.exists(mcu.path('/a.py'))  # Note: refused before sending a byte
+    output = []
+    package.push('app', nofail=True, _progress=output.append)
+    assert 'WARNING: Not enough space' in ''.join(output)
+    mcu.free_blocks = 1
+    package.push('app')  # Note: nothing to upload
+
+
+def test_push_mpy_unchanged(project, mcu):
+    config = project({'app': {'files': ['a.py', 'b.py'], 'mpy': True}}, {'a.py': 'a = 1\n', 'b.py': 'b = 1\n'})
+    package = package_module.Package(config)
+    package.push('app')
+    assert sorted(os.listdir(mcu.path('/'))) == ['.microdeploy.manifest', 'a.mpy', 'b.mpy']
+    mcu.free_blocks = 1
+    output = []
+    package.push('app', _progress=output.append)  # Note: nothing to upload, compared as .mpy
+    assert not [state for state in output if state.startswith('Space on MCU')]
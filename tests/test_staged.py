@@ -0,0 +1,42 @@
+from microdeploy import package as package_module
+import os
+
+
+FILES = {'main.py': 'import mod\n', 'boot.py': 'booted = True\n', 'lib/mod.py': '# module\nx = 1\n'}
+
+
+def push(config, name='app'):
+    output = []
+    package_module.Package(config).push(name, _progress=output.append)
+    return ''.join(output)
+
+
+def test_staged_push_imports_from_slot_lib(project, mcu):
+    config = project({'app': {'files': ['main.py', 'lib/mod.py'], 'staged': True}}, FILES)
+    push(config)
+    assert open(mcu.path('/.slot')).read() == 'slot_a'
+    assert mcu.os.getcwd() == '/slot_a'  # Note: MCU was reset, main.py runs from slot
+    device = package_module.Package(config).device
+    assert device.exec('import mod\nprint(mod.x)') == '1\r\n'
+
+
+def test_staged_push_backs_up_boot(project, mcu):
+    os.makedirs(mcu.root, exist_ok=True)
+    with open(mcu.path('/boot.py'), 'w') as f:
+        f.write('user = True\n')
+    config = project({'app': {'files': ['main.py', 'boot.py', 'lib/mod.py'], 'staged': True}}, FILES)
+    assert 'WARNING: Existing /boot.py on MCU backed up as /boot.py.bak' in push(config)
+    assert open(mcu.path('/boot.py.bak')).read() == 'user = True\n'
+    assert 'WARNING' not in push(config)  # Note: staged boot.py already installed
+    assert open(mcu.path('/boot.py.bak')).read() == 'user = True\n'
+
+
+def test_staged_push_copies_built_files_from_active_slot(project, mcu):
+    config = project({'app': {'files': ['main.py', 'boot.py', 'lib/mod.py'], 'staged': True, 'minify': True, 'mpy': True}}, FILES)
+    output = push(config)
+    assert sorted(os.listdir(mcu.path('/slot_a')) ) == ['boot.py', 'lib', 'main.py']  # Note: main.py and boot.py are not compiled
+    assert os.listdir(mcu.path('/slot_a/lib')) == ['mod.mpy']
+    output = push(config)
+    assert output.count('Copy: ') == 3 and 'Put: ' not in output
+    assert open(mcu.path('/.slot')).read() == 'slot_b'
+    assert open(mcu.path('/slot_b/lib/mod.mpy'), 'rb').read() == open(mcu.path('/slot_a/lib/mod.mpy'), 'rb').read()
@@ -0,0 +1,20 @@
+from microdeploy import package as package_module
+import json
+import os
+
+
+def test_watch_uploads_changed_files(project, mcu, tmp_path):
+    config = project({'app': {'files': ['main.py', 'lib.py']}}, {'main.py': 'v = 1\n', 'lib.py': 'w = 1\n'})
+    package = package_module.Package(config)
+    output = []
+    def progress(state):
+        output.append(state)
+        if state == 'Watching package: app: 2 files -> MCU... (ctrl-C to stop)\n\n':
+            (tmp_path / 'project' / 'main.py').write_text('v = 2\n')
+            os.utime(tmp_path / 'project' / 'main.py', ns=(0, 0))  # Note: mtime changes, even within clock resolution
+        elif state == 'Watching package: app...\n\n':
+            raise KeyboardInterrupt()  # Note: as ctrl-C
+    package.watch('app', interval=0.01, debounce=0.01, _progress=progress)
+    assert open(mcu.path('/main.py')).read() == 'v = 2\n'
+    assert not os.path.exists(mcu.path('/lib.py'))  # Note: unchanged files are not uploaded
+    assert '/main.py' in json.load(open(mcu.path('/.microdeploy.manifest')))  # Note: saved when interrupted
@@ -0,0 +1,156 @@
+from microdeploy import webrepl as webrepl_module
+from microdeploy import package as package_module
+from conftest import make_device
+import threading
+import hashlib
+import base64
+import select
+import socket
+import struct
+import pytest
+import re
+
+
+class WebREPLServer(object):
+    """Stand-in WebREPL server on localhost: terminal of simulated MCU, and file transfers on its filesystem."""
+
+    def __init__(self, mcu, password='secret'):
+        self.mcu = mcu
+        self.password = password
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.url = f'ws://127.0.0.1:{self.listener.getsockname()[1]}'
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            connection, address = self.listener.accept()
+            try:
+                self.session(connection)
+            except OSError:
+                pass
+            finally:
+                connection.close()
+
+    def session(self, connection):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            request += connection.recv(1)
+        key = re.search(rb'Sec-WebSocket-Key: (\S+)', request).group(1)
+        accept = base64.b64encode(hashlib.sha1(key + b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11').digest())
+        connection.sendall(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Accept: %s\r\n\r\n' % accept)
+        self.send(connection, 0x1, b'Password: ')
+        password = b''
+        while not password.endswith(b'\r'):
+            password += self.receive(connection)[1]
+        if password[:-1].decode() != self.password:
+            self.send(connection, 0x1, b'\r\nAccess denied\r\n')
+            return
+        self.send(connection, 0x1, b'\r\nWebREPL connected\r\n>>> ')
+        while True:
+            if select.select([connection], [], [], 0.01)[0]:
+                opcode, payload = self.receive(connection)
+                if opcode == 0x8:
+                    return
+                elif opcode == 0x1:
+                    self.mcu.write(payload)
+                elif opcode == 0x2:
+                    self.transfer(connection, payload)
+            n = self.mcu.inWaiting()
+            if n:
+                self.send(connection, 0x1, self.mcu.read(n))
+
+    def transfer(self, connection, request):
+        while len(request) < struct.calcsize(webrepl_module._REQUEST):
+            request += self.receive(connection)[1]
+        signature, operation, reserved, reserved, size, length, filename = struct.unpack(webrepl_module._REQUEST, request)
+        path = self.mcu.path(filename[:length].decode())
+        try:
+            if operation == webrepl_module._PUT:
+                f = open(path, 'wb')
+            else:
+                data = open(path, 'rb').read()
+        except OSError as e:
+            return self.respond(connection, e.errno)
+        self.respond(connection, 0)
+        if operation == webrepl_module._PUT:
+            data = b''
+            while len(data) < size:
+                data += self.receive(connection)[1]
+            f.write(data)
+            f.close()
+        else:
+            for i in range(0, len(data) + 1, 256):  # Note: last chunk is empty
+                self.receive(connection)  # Note: client requests next chunk
+                self.send(connection, 0x2, struct.pack('<H', len(data[i:i+256])) + data[i:i+256])
+        self.respond(connection, 0)
+
+    def respond(self, connection, status):
+        self.send(connection, 0x2, struct.pack(webrepl_module._RESPONSE, b'WB', status))
+
+    def send(self, connection, opcode, payload):
+        assert len(payload) < 2**16
+        header = bytes([0x80 | opcode]) + (bytes([len(payload)]) if len(payload) < 126 else bytes([126]) + struct.pack('>H', len(payload)))
+        connection.sendall(header + payload)
+
+    def receive(self, connection):
+        header = self.recv(connection, 2)
+        length = header[1] & 0x7f
+        if length == 126:
+            length, = struct.unpack('>H', self.recv(connection, 2))
+        elif length == 127:
+            length, = struct.unpack('>Q', self.recv(connection, 8))
+        mask = self.recv(connection, 4)
+        return header[0] & 0x0f, webrepl_module._mask(self.recv(connection, length), mask)
+
+    def recv(self, connection, size):
+        data = b''
+        while len(data) < size:
+            chunk = connection.recv(size - len(data))
+            if not chunk:
+                raise ConnectionResetError()
+            data += chunk
+        return data
+
+
+@pytest.fixture
+def server(mcu):
+    return WebREPLServer(mcu)
+
+
+def test_put_get(server, mcu, tmp_path):
+    device = make_device(port=server.url, password='secret')
+    data = bytes(range(256)) * 3
+    (tmp_path / 'data.bin').write_bytes(data)
+    assert device.put(str(tmp_path / 'data.bin'), 'lib/data.bin') == len(data)  # Note: directory is created
+    assert open(mcu.path('/lib/data.bin'), 'rb').read() == data
+    assert device.get('lib/data.bin') == data
+
+
+def test_get_missing_file(server):
+    device = make_device(port=server.url, password='secret')
+    with pytest.raises(RuntimeError, match='No such file: missing.py'):
+        device.get('missing.py')
+
+
+@pytest.mark.parametrize('softreset', [False, True])
+def test_exec(server, mcu, softreset):
+    device = make_device(port=server.url, password='secret', softreset=softreset)
+    assert device.exec('print(1)') == '1\r\n'
+    assert mcu.soft_reboots == int(softreset)
+
+
+def test_wrong_password(server):
+    with pytest.raises(PermissionError, match='WebREPL access denied'):
+        make_device(port=server.url, password='wrong').pyboard
+
+
+def test_mask():
+    assert webrepl_module._mask(b'hello', b'\x01\x02\x03\x04') == bytes(a ^ b for a, b in zip(b'hello', b'\x01\x02\x03\x04\x01'))
+    assert webrepl_module._mask(webrepl_module._mask(b'x' * 1000, b'abcd'), b'abcd') == b'x' * 1000
+
+
+def test_staged_push(server, project, mcu):
+    config = project({'app': {'files': ['main.py'], 'staged': True}}, {'main.py': 'x = 1\n'}, device={'port': server.url, 'password': 'secret'})
+    package_module.Package(config).push('app')
+    assert open(mcu.path('/.slot')).read() == 'slot_a'
+    assert open(mcu.path('/slot_a/main.py')).read() == 'x = 1\n'